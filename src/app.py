@@ -1,17 +1,52 @@
+import time
+
 import streamlit as st
-from streamlit_folium import st_folium
+import streamlit.components.v1 as components
+
+from main_pipeline import ArticleLocationExtractor
+from cache_store import SingleFlightMemo, article_input_key
+
+# pandas, folium (map_viz) and streamlit_folium are imported where a result is
+# drawn, so the first page load does not wait for them
+
+# static HTML frame for the preview map (`st.iframe` replaces components.html in newer Streamlit)
+_html_frame = getattr(st, "iframe", None) or components.html
 
-from main_pipeline import ArticleLocationExtractor 
+# pipeline results are reused across sessions for this long
+RESULT_TTL_SECONDS = 3600
+RESULT_MAX_ENTRIES = 256
+# the preview map is redrawn at most this often while locations stream in, plus once when all are in
+PREVIEW_MIN_INTERVAL_SECONDS = 1.5
 
 st.set_page_config(page_title="News → Map", page_icon="🗺️", layout="wide")
 st.title("News → Map")
 st.caption("Paste a news URL or text. I’ll extract locations and plot them with relevant info on an interactive map")
 
+
+@st.cache_resource
+def get_extractor(api_key):
+    """One extractor per process: the Gemini client, geocoder rate limiter and caches are shared by all sessions."""
+    return ArticleLocationExtractor(api_key=api_key)
+
+
+@st.cache_resource
+def get_result_memo():
+    """Process-wide memo of pipeline results; concurrent requests for the same article run the pipeline once."""
+    return SingleFlightMemo(ttl=RESULT_TTL_SECONDS, max_entries=RESULT_MAX_ENTRIES)
+
+
+@st.cache_resource(max_entries=RESULT_MAX_ENTRIES)
+def get_map(map_key, _coords_df):
+    """Folium map for a result, built once per distinct `coords_df` (keyed by `map_data_key`) instead of on every rerun."""
+    return get_extractor(api_key).create_intmap(_coords_df, open_in_browser=False)
+
+
 # Get API key from Streamlit secrets
 api_key = st.secrets.get("GEMINI_API_KEY", None)
 
-# Instantiate orchestrator
-extractor = ArticleLocationExtractor(api_key=api_key)
+# Shared orchestrator (built once per process, not on every rerun)
+extractor = get_extractor(api_key)
+result_memo = get_result_memo()
 
 # INIT session state
 if "result" not in st.session_state:
@@ -32,19 +67,54 @@ if run:
         st.warning("Please paste some text.")
         st.stop()
 
+    input_text, is_url = (url, True) if mode == "URL" else (text, False)
+
+    def _run_pipeline():
+        import pandas as pd
+        from map_viz import create_styled_map
+
+        # show each stage's output as it arrives: article first, then the markers in throttled batches
+        article_box, status_box, map_box = st.empty(), st.empty(), st.empty()
+        rows, n_rows, result, last_draw = {}, 0, None, 0.0
+        try:
+            for ev in extractor.iter_process_article(input_text, is_url=is_url):
+                if ev["event"] == "article":
+                    with article_box.container():
+                        with st.expander("Article text"):
+                            st.write(ev["article_text"])
+                    status_box.info("Extracting locations with Gemini…")
+                elif ev["event"] == "locations":
+                    n_rows = len(ev["locations"]["summary"])
+                    status_box.info(f"Geocoding {n_rows} locations…")
+                elif ev["event"] == "location":
+                    rows[ev["index"]] = ev["row"]
+                    status_box.info(f"Geocoded {len(rows)}/{n_rows} locations…")
+                    # rebuilding the map costs O(rows), so not on every row; built with create_styled_map
+                    # rather than create_intmap to keep the preview out of the "map" stage timings
+                    if time.monotonic() - last_draw < PREVIEW_MIN_INTERVAL_SECONDS and len(rows) < n_rows:
+                        continue
+                    partial = pd.DataFrame([rows[ix] for ix in sorted(rows)])
+                    if partial.lat.notnull().any():
+                        fmap = create_styled_map(partial)
+                        with map_box.container():
+                            _html_frame(fmap.get_root().render(), height=600)
+                        last_draw = time.monotonic()
+                else:
+                    # store only the data needed to rebuild map; not the Folium map object
+                    result = {
+                        "coords_df": ev["coords_df"],
+                        "locations": ev["locations"],
+                        "article_text": ev["article_text"],
+                    }
+        finally:
+            # the final interactive map and article are drawn by the render section below
+            for box in (article_box, status_box, map_box):
+                box.empty()
+        return result
+
     try:
         with st.spinner("Processing…"):
-            result = extractor.process_article(
-                url if mode == "URL" else text,
-                is_url=(mode == "URL"),
-                for_streamlit=True
-            )
-        # store only the data needed to rebuild map; not the Folium map object
-        st.session_state["result"] = {
-            "coords_df": result["coords_df"],
-            "locations": result["locations"],
-            "article_text": result["article_text"],
-        }
+            st.session_state["result"] = result_memo.get_or_compute(article_input_key(input_text, is_url), _run_pipeline)
     except Exception as e:
         st.session_state["result"] = None
         st.error(f"{type(e).__name__}: {e}")
@@ -52,11 +122,15 @@ if run:
 # RENDER
 res = st.session_state["result"]
 if res:
-    # rebuild the map every render; stable key avoids remount jitter
-    fmap = extractor.create_intmap(res["coords_df"], open_in_browser=False)
+    from streamlit_folium import st_folium
+    from map_viz import map_data_key
+
+    # cached map; stable key avoids remount jitter
+    fmap = get_map(map_data_key(res["coords_df"]), res["coords_df"])
 
     st.subheader("Interactive map")
-    st_folium(fmap, width=1100, height=600, key="map")
+    # no returned objects: panning and zooming do not trigger a Streamlit rerun
+    st_folium(fmap, width=1100, height=600, key="map", returned_objects=[])
 
     with st.expander("Article text"):
         st.write(res["article_text"])
@@ -68,4 +142,3 @@ if res:
     # with st.expander("LLM-extracted raw locations (debug)"):
     #     st.write(res["locations"])
 
-
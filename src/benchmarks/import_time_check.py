@@ -0,0 +1,103 @@
+"""
+Startup-time check: measures `python -X importtime` of the entry modules and
+the wall time of `main_pipeline.py --help`, and fails if a heavy dependency is
+imported at module load again or a budget is exceeded.
+
+Heavy dependencies (google.genai, geopy, requests_cache, pandas, folium,
+trafilatura, tqdm) are imported on first use, so short-lived CLI runs and the
+first Streamlit page load only pay for what they need.
+
+Usage:
+    python src/benchmarks/import_time_check.py
+    python src/benchmarks/import_time_check.py --repeats 5 --top 15
+
+Exits with status 1 on a violation.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must not be imported by `import <entry module>`
+DEFERRED_MODULES = ("google.genai", "geopy", "requests_cache", "pandas", "folium", "trafilatura", "tqdm")
+# cumulative import time budgets (milliseconds); measured at ~180 ms for main_pipeline,
+# most of it `requests`, with headroom for slower machines
+IMPORT_BUDGETS_MS = {
+    "main_pipeline": 500,
+    "nlp_loc_extractor": 150,
+    "local_loc_extractor": 200,
+    "cache_store": 100,
+}
+# wall time of a whole `python main_pipeline.py --help` process, interpreter start included
+CLI_HELP_BUDGET_SECONDS = 0.8
+
+
+def import_times(module: str) -> Tuple[float, Dict[str, float]]:
+    """Cumulative import time of `module` in a fresh interpreter, and of every module it imported (ms)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    modules: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() == "site":
+            modules.clear()  # everything so far was interpreter startup
+            continue
+        modules[name.strip()] = int(cumulative) / 1000.0
+    return modules.get(module, 0.0), modules
+
+
+def cli_help_seconds() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main_pipeline.py", "--help"], cwd=SRC_DIR, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import time budgets of the entry modules")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per measurement; the fastest one counts")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports listed for main_pipeline")
+    args = parser.parse_args()
+
+    problems: List[str] = []
+    slowest_main: List[Tuple[float, str]] = []
+    print(f"{'module':<24}{'import ms':>10}{'budget ms':>11}")
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        runs = [import_times(module) for _ in range(args.repeats)]
+        total, imported = min(runs, key=lambda r: r[0])
+        print(f"{module:<24}{total:>10.0f}{budget:>11}")
+        if total > budget:
+            problems.append(f"import {module} took {total:.0f} ms (budget {budget} ms)")
+        for heavy in DEFERRED_MODULES:
+            if any(name == heavy or name.startswith(heavy + ".") for name in imported):
+                problems.append(f"import {module} imports {heavy} at module load")
+        if module == "main_pipeline":
+            slowest = sorted(((ms, name) for name, ms in imported.items() if name != module), reverse=True)
+            slowest_main = slowest[:args.top]
+
+    help_s = min(cli_help_seconds() for _ in range(args.repeats))
+    print(f"{'main_pipeline.py --help':<24}{help_s * 1000:>10.0f}{CLI_HELP_BUDGET_SECONDS * 1000:>11.0f}")
+    if help_s > CLI_HELP_BUDGET_SECONDS:
+        problems.append(f"main_pipeline.py --help took {help_s:.2f} s (budget {CLI_HELP_BUDGET_SECONDS} s)")
+
+    print("\nSlowest imports under main_pipeline (cumulative ms):")
+    for ms, name in slowest_main:
+        print(f"{ms:>10.1f}  {name}")
+
+    if problems:
+        print("\nImport time check failed:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("\nImport time check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Offline benchmark of the whole pipeline, replaying recorded Gemini and
+Nominatim responses through local stubs (see `stubs.py`), so it needs no API
+key or network and can run on every change to catch performance regressions.
+
+It reports:
+- end-to-end throughput (articles/minute) of `process_articles` over URLs
+  served by a local HTTP server, with per-stage latency percentiles taken from
+  the pipeline's own instrumentation (fetch, parse, llm, geocode, ...),
+- peak Python memory (tracemalloc) and time of `geocode_nominatim` (DataFrame
+  and columnar `LocationTable` output) and `create_styled_map` at several
+  numbers of locations.
+
+Usage:
+    python src/benchmarks/offline_benchmark.py
+    python src/benchmarks/offline_benchmark.py --articles 200 --llm-latency 1.5 --geocode-latency 0.05
+    python src/benchmarks/offline_benchmark.py --save baseline.json
+    python src/benchmarks/offline_benchmark.py --baseline baseline.json --tolerance 0.25
+
+With `--baseline`, the run exits with status 1 if throughput dropped, or a
+stage latency or peak memory grew, by more than `--tolerance` (a fraction).
+Latencies injected with the `--*-latency` options stand in for the real
+services; keep them identical between the baseline and the compared run.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article_text_extractor import ArticleFetcher
+from geocode_loc_finder import geocode_nominatim
+from instrumentation import Metrics, set_metrics
+from main_pipeline import ArticleLocationExtractor
+from map_viz import create_styled_map
+from rate_policy import RatePolicy
+
+from stubs import StubGeminiClient, StubServer, fake_geocode, load_fixture
+
+DEFAULT_SIZES = (10, 100, 10_000)
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def _timing_collector() -> Tuple[Dict[str, List[float]], Callable[[Dict[str, Any]], None]]:
+    # raw durations per "metric{labels}", as the registry itself only keeps histogram buckets
+    samples: Dict[str, List[float]] = {}
+
+    def _sink(event: Dict[str, Any]) -> None:
+        if event["type"] == "timer":
+            labels = ",".join(f"{k}={v}" for k, v in sorted(event["labels"].items()))
+            samples.setdefault(f"{event['metric']}{{{labels}}}", []).append(event["value"])
+    return samples, _sink
+
+
+def run_pipeline_benchmark(n_articles: int = 50, llm_latency: float = 0.5, geocode_latency: float = 0.02,
+                           fetch_latency: float = 0.05, llm_workers: int = 4, parse_workers: int = 0,
+                           geocode_rate: float = 50.0) -> Dict[str, Any]:
+    """
+    Run `process_articles` over `n_articles` fixture URLs against the stubs.
+
+    Every article is a distinct URL (the fixture articles cycled), all
+    persistent caches are disabled, and the geocoder is rate-limited to
+    `geocode_rate` requests/second, as for a self-hosted Nominatim. The
+    in-memory geocode memo stays on, as in a real batch.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Throughput, error counts, request counts and latency percentiles in seconds.
+    """
+    articles = load_fixture("articles.json")
+    metrics = Metrics()
+    samples, sink = _timing_collector()
+    metrics.add_sink(sink)
+    set_metrics(metrics)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubServer(articles, fetch_latency=fetch_latency, geocode_latency=geocode_latency) as server:
+        os.chdir(tmp)  # the geocoder's HTTP cache is created in the working directory
+        try:
+            extractor = ArticleLocationExtractor(
+                api_key="offline-benchmark", model_name="gemini-2.5-flash",
+                geocode_store_path=None, llm_cache_path=None, prompt_cache=False,
+                fetcher=ArticleFetcher(cache_path=None),
+                nominatim_domain=server.nominatim_domain, nominatim_scheme="http",
+                rate_policy=RatePolicy(rate=geocode_rate, burst=int(geocode_rate), max_in_flight=8),
+            )
+            client = extractor.client = StubGeminiClient(articles, latency=llm_latency)
+            urls = [server.article_url(articles[i % len(articles)]["id"], copy=i) for i in range(n_articles)]
+
+            start = time.perf_counter()
+            results = list(extractor.process_articles(urls, is_url=True, llm_workers=llm_workers,
+                                                      parse_workers=parse_workers))
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+            set_metrics(Metrics())
+        requests = dict(server.requests)
+
+    errors: Dict[str, int] = {}
+    for r in results:
+        if r["error"] is not None:
+            errors[type(r["error"]).__name__] = errors.get(type(r["error"]).__name__, 0) + 1
+    return {
+        "articles": len(results),
+        "seconds": elapsed,
+        "articles_per_minute": 60.0 * len(results) / elapsed if elapsed else 0.0,
+        "locations": int(sum(len(r["coords_df"]) for r in results if r["coords_df"] is not None)),
+        "errors": errors,
+        "llm_calls": client.calls,
+        "http_requests": requests,
+        "latency": {name: {f"p{p}": percentile(sorted(values), p) for p in PERCENTILES} | {"count": len(values)}
+                    for name, values in sorted(samples.items())},
+    }
+
+
+def synthetic_locations(n: int) -> Dict[str, List[str]]:
+    """`n` distinct extracted locations in the LLM output format; one in ten is a landmark."""
+    out = {k: [] for k in ("cities", "provinces_counties", "states", "countries", "landmarks", "summary")}
+    for i in range(n):
+        out["cities"].append(f"Town {i}")
+        out["provinces_counties"].append(f"County {i % 500}")
+        out["states"].append(f"State {i % 50}")
+        out["countries"].append(f"Country {i % 20}")
+        out["landmarks"].append(f"Landmark {i}" if i % 10 == 0 else "None")
+        out["summary"].append(f"Something happened in town {i}, affecting {i % 97} residents.")
+    return out
+
+
+def measure(fn: Callable[[], Any]) -> Tuple[Any, float, int]:
+    """Run `fn`, returning its result, the wall time and the peak traced memory in bytes."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_memory_benchmark(sizes=DEFAULT_SIZES) -> Dict[str, Dict[str, float]]:
+    """Peak memory and time of geocoding and map building for each number of locations."""
+    out = {}
+    for n in sizes:
+        locations = synthetic_locations(n)
+        df, geo_s, geo_peak = measure(lambda: geocode_nominatim(locations, fake_geocode, memo={}))
+        _, _, table_peak = measure(lambda: geocode_nominatim(locations, fake_geocode, memo={}, as_table=True))
+        _, map_s, map_peak = measure(lambda: create_styled_map(df))
+        out[str(n)] = {
+            "geocode_seconds": geo_s, "geocode_peak_mb": geo_peak / 2**20, "table_peak_mb": table_peak / 2**20,
+            "map_seconds": map_s, "map_peak_mb": map_peak / 2**20,
+        }
+    return out
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of `results` against `baseline`, as readable messages."""
+    problems = []
+    new, old = results["pipeline"], baseline["pipeline"]
+    if new["articles_per_minute"] < old["articles_per_minute"] * (1 - tolerance):
+        problems.append(f"throughput {new['articles_per_minute']:.1f} < baseline "
+                        f"{old['articles_per_minute']:.1f} articles/min")
+    for name, stats in new["latency"].items():
+        if name in old["latency"] and name.startswith("stage_seconds"):
+            for p in ("p50", "p90"):
+                if stats[p] > old["latency"][name][p] * (1 + tolerance) + 0.001:
+                    problems.append(f"{name} {p} {stats[p] * 1000:.1f} ms > baseline "
+                                    f"{old['latency'][name][p] * 1000:.1f} ms")
+    for n, stats in results["memory"].items():
+        for key in ("geocode_peak_mb", "table_peak_mb", "map_peak_mb"):
+            if n in baseline["memory"] and key in baseline["memory"][n] and stats[key] > baseline["memory"][n][key] * (1 + tolerance):
+                problems.append(f"{key} at {n} locations {stats[key]:.1f} MB > baseline "
+                                f"{baseline['memory'][n][key]:.1f} MB")
+    return problems
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    p = results["pipeline"]
+    print(f"\nPipeline: {p['articles']} articles in {p['seconds']:.2f}s = {p['articles_per_minute']:.1f} articles/min, "
+          f"{p['locations']} locations, {p['llm_calls']} LLM calls, {p['http_requests']['search']} geocode requests")
+    if p["errors"]:
+        print(f"  errors: {p['errors']}")
+    print(f"\n{'timer':<48}{'count':>7}" + "".join(f"{'p%d ms' % q:>10}" for q in PERCENTILES))
+    for name, stats in p["latency"].items():
+        print(f"{name:<48}{stats['count']:>7}" + "".join(f"{stats['p%d' % q] * 1000:>10.1f}" for q in PERCENTILES))
+    print(f"\n{'locations':>10}{'geocode s':>11}{'geocode MB':>12}{'table MB':>10}{'map s':>8}{'map MB':>9}")
+    for n, m in results["memory"].items():
+        print(f"{n:>10}{m['geocode_seconds']:>11.2f}{m['geocode_peak_mb']:>12.1f}{m['table_peak_mb']:>10.1f}"
+              f"{m['map_seconds']:>8.2f}{m['map_peak_mb']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark with recorded responses")
+    parser.add_argument("--articles", type=int, default=50, help="Articles pushed through process_articles")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per Gemini call")
+    parser.add_argument("--geocode-latency", type=float, default=0.02, help="Seconds per Nominatim request")
+    parser.add_argument("--fetch-latency", type=float, default=0.05, help="Seconds per article download")
+    parser.add_argument("--llm-workers", type=int, default=4)
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="Parsing processes (default 0: parse on the fetch threads)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated numbers of locations for the memory benchmark")
+    parser.add_argument("--save", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    results = {
+        "settings": {k: v for k, v in vars(args).items() if k not in ("save", "baseline", "tolerance")},
+        "pipeline": run_pipeline_benchmark(args.articles, args.llm_latency, args.geocode_latency,
+                                           args.fetch_latency, args.llm_workers, args.parse_workers),
+        "memory": run_memory_benchmark([int(s) for s in args.sizes.split(",") if s]),
+    }
+    print_report(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.save}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print("\nRegressions against the baseline:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print(f"\nNo regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark: tokens and latency per extraction request for the ways of sending
+the static prompt prefix:
+
+- "in_contents": instructions and article together in `contents` (the prompt
+  layout before `SYSTEM_INSTRUCTION` existed),
+- "system_instruction": the prefix as system instruction (the default path),
+- with `--cacheable-prefix`, the prefix padded past the model's minimum
+  explicit cache size (`MIN_CACHE_TOKENS`), sent once as system instruction
+  ("padded_inline") and once held in a context cache ("padded_context_cache").
+  The real `SYSTEM_INSTRUCTION` (~800 tokens) is below every minimum, so
+  without padding a context cache is never used.
+
+Each row reports the path the requests actually took.
+
+Usage:
+    python src/benchmarks/prompt_prefix_benchmark.py --model gemini-2.5-flash --repeats 3
+    python src/benchmarks/prompt_prefix_benchmark.py --cacheable-prefix
+    python src/benchmarks/prompt_prefix_benchmark.py --input-file articles.jsonl
+
+Needs GEMINI_API_KEY (environment or .env) and makes real API calls.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from google import genai
+
+from nlp_loc_extractor import (extract_locations_with_gemini, min_cache_tokens, record_usage, PromptPrefixCache,
+                               CHARS_PER_TOKEN, LOCATION_RESPONSE_SCHEMA, SYSTEM_INSTRUCTION)
+from retry_policy import RetryPolicy
+
+SAMPLE_ARTICLES = [
+    "Firefighters contained a brush fire near Griffith Park in Los Angeles on Tuesday after it burned 30 acres.",
+    "Heavy rain flooded streets in Porto Alegre, in the Brazilian state of Rio Grande do Sul, forcing thousands to evacuate.",
+    "The European Central Bank left rates unchanged at its meeting in Frankfurt, while markets in London and Paris rose.",
+    "A magnitude 5.1 earthquake shook the Hualien region of eastern Taiwan early Wednesday, with no damage reported.",
+]
+
+
+def read_articles(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)["text"] if line.startswith("{") else line
+
+
+# neutral text appended to the instructions to reach a cacheable prefix size
+PADDING_PARAGRAPH = ("Reference note, not an instruction: news articles often mention places only in passing, "
+                     "in datelines, quotes or background paragraphs, and all of them are relevant. ")
+
+
+class InlineOnly(PromptPrefixCache):
+    """A prefix cache that never caches: its `system_instruction` is always sent inline."""
+
+    def get(self, client, model_name):
+        return None
+
+
+def padded_instruction(model_name: str) -> str:
+    """`SYSTEM_INSTRUCTION` padded to a little above the model's minimum explicit cache size."""
+    target_chars = (min_cache_tokens(model_name) + 64) * CHARS_PER_TOKEN
+    repeats = max(0, -(-(target_chars - len(SYSTEM_INSTRUCTION)) // len(PADDING_PARAGRAPH)))
+    return SYSTEM_INSTRUCTION + "\n\n" + PADDING_PARAGRAPH * repeats
+
+
+def in_contents_extractor(client, model_name, policy):
+    from google.genai import types
+    config = types.GenerateContentConfig(response_mime_type="application/json",
+                                         response_schema=LOCATION_RESPONSE_SCHEMA)
+
+    def _extract(text, usage):
+        def _call():
+            response = client.models.generate_content(
+                model=model_name, contents=f"{SYSTEM_INSTRUCTION}\n\nArticle text:\n{text}", config=config)
+            record_usage(usage, response)
+        policy.run(_call)
+    return _extract
+
+
+def prefix_extractor(client, model_name, policy, prefix_cache):
+    def _extract(text, usage):
+        extract_locations_with_gemini(text, client, model_name, retry_policy=policy, usage=usage,
+                                      prefix_cache=prefix_cache, raise_on_failure=True)
+    return _extract
+
+
+def run_mode(extract, articles, repeats, path):
+    rows = []
+    for _ in range(repeats):
+        for text in articles:
+            usage = {}
+            start = time.monotonic()
+            extract(text, usage)
+            rows.append((time.monotonic() - start, usage))
+    latencies = sorted(r[0] for r in rows)
+    return {
+        "path": path,
+        "requests": len(rows),
+        "median_latency_seconds": statistics.median(latencies),
+        "p95_latency_seconds": latencies[int(0.95 * (len(latencies) - 1))],
+        "mean_input_tokens": statistics.mean(r[1].get("input_tokens", 0) for r in rows),
+        "mean_cached_tokens": statistics.mean(r[1].get("cached_tokens", 0) for r in rows),
+        "mean_output_tokens": statistics.mean(r[1].get("output_tokens", 0) for r in rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ways of sending the static prompt prefix")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--repeats", type=int, default=2, help="Passes over the articles per mode")
+    parser.add_argument("--input-file", help="One article per line, or JSONL with a \"text\" key")
+    parser.add_argument("--cacheable-prefix", action="store_true",
+                        help="Also compare inline vs context-cached with the prefix padded past the cache minimum")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+    articles = list(read_articles(args.input_file)) if args.input_file else SAMPLE_ARTICLES
+    count = lambda text: client.models.count_tokens(model=args.model, contents=text).total_tokens
+    print(f"Static prefix: {len(SYSTEM_INSTRUCTION)} characters, {count(SYSTEM_INSTRUCTION)} tokens; "
+          f"explicit cache minimum of {args.model}: {min_cache_tokens(args.model)} tokens")
+
+    policy = RetryPolicy(verbose=False)
+    results = {
+        "in_contents": run_mode(in_contents_extractor(client, args.model, policy), articles, args.repeats,
+                                "contents"),
+        "system_instruction": run_mode(prefix_extractor(client, args.model, policy, None), articles, args.repeats,
+                                       "system_instruction"),
+    }
+    if args.cacheable_prefix:
+        padded = padded_instruction(args.model)
+        print(f"Padded prefix: {len(padded)} characters, {count(padded)} tokens")
+        results["padded_inline"] = run_mode(
+            prefix_extractor(client, args.model, policy, InlineOnly(system_instruction=padded)),
+            articles, args.repeats, "system_instruction")
+        cache = PromptPrefixCache(ttl=600, system_instruction=padded)
+        # creates the cache entry the timed calls then use
+        cache_name = cache.get(client, args.model)
+        results["padded_context_cache"] = run_mode(
+            prefix_extractor(client, args.model, policy, cache), articles, args.repeats,
+            f"cached_content {cache_name}" if cache_name else "system_instruction (cache unavailable)")
+    else:
+        print("Context cache modes skipped: the prefix is below the cache minimum (use --cacheable-prefix)")
+
+    print(f"\n{'mode':<22}{'requests':>9}{'median s':>10}{'p95 s':>8}{'input tok':>11}{'cached tok':>12}"
+          f"{'output tok':>12}  path")
+    for mode, r in results.items():
+        print(f"{mode:<22}{r['requests']:>9}{r['median_latency_seconds']:>10.2f}{r['p95_latency_seconds']:>8.2f}"
+              f"{r['mean_input_tokens']:>11.0f}{r['mean_cached_tokens']:>12.0f}{r['mean_output_tokens']:>12.0f}"
+              f"  {r['path']}")
+
+
+if __name__ == "__main__":
+    main()
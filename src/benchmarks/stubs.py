@@ -0,0 +1,246 @@
+"""
+Offline stand-ins for the services the pipeline talks to, replaying recorded
+responses from `fixtures/` with an injectable latency:
+
+- `StubGeminiClient`: exposes `models.generate_content` and `caches.create`
+  like `genai.Client`, answering each extraction with the recorded response of
+  the fixture article found in the prompt.
+- `StubServer`: local HTTP server for article pages (`/articles/<id>`) and a
+  Nominatim-compatible `/search` endpoint, so fetching, parsing, rate limiting
+  and geopy run unchanged against `http://127.0.0.1:<port>`.
+- `fake_geocode`: in-process geocode callable returning geopy-like `Location`s,
+  for measuring `geocode_nominatim` without any HTTP at all.
+
+Queries that have no recorded Nominatim answer get a deterministic synthetic
+one, so any extraction can be replayed.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from html import escape
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# structured Nominatim parameters, in the order used for fixture keys
+STRUCTURED_PARAMS = ["amenity", "street", "city", "county", "state", "country", "postalcode"]
+
+
+def load_fixture(name: str) -> Any:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def nominatim_key(params: Dict[str, str]) -> str:
+    """Fixture key of a Nominatim query: the free-form `q`, or "city=...; state=..." for structured ones."""
+    if params.get("q"):
+        return params["q"]
+    return "; ".join(f"{k}={params[k]}" for k in STRUCTURED_PARAMS if params.get(k))
+
+
+def synthetic_place(key: str, landmark: bool = False) -> Dict[str, Any]:
+    """Deterministic Nominatim-style result for a query without a recorded answer."""
+    h = int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+    lat = -55.0 + (h % 125_000) / 1000.0
+    lon = -180.0 + (h // 125_000 % 360_000) / 1000.0
+    name = key.split("; ")[0].split("=")[-1] if not landmark else key.split(",")[0]
+    return {
+        "place_id": h % 10**9, "osm_type": "node", "osm_id": h % 10**10,
+        "lat": f"{lat:.7f}", "lon": f"{lon:.7f}",
+        "class": "tourism" if landmark else "place", "type": "attraction" if landmark else "city",
+        "importance": 0.3 + (h % 500) / 1000.0, "name": name,
+        "display_name": ", ".join(part.split("=")[-1] for part in key.replace(", ", "; ").split("; ")),
+    }
+
+
+# ---------------------------------------------------------------------------------------- Gemini
+
+
+class _StubModels:
+    def __init__(self, client: "StubGeminiClient"):
+        self._client = client
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> SimpleNamespace:
+        return self._client._respond(model, str(contents))
+
+
+class _StubCaches:
+    def create(self, model: str, config: Any = None):
+        # like a model or tier without context caching: PromptPrefixCache falls back to inline
+        raise NotImplementedError("context caching is not available offline")
+
+
+class StubGeminiClient:
+    """
+    Replays recorded extraction responses; a drop-in for `genai.Client`.
+
+    Parameters
+    ----------
+    articles : list of dict, optional
+        Fixture articles with "text" and "response", by default `fixtures/articles.json`.
+    latency : float, optional
+        Seconds each `generate_content` call sleeps, by default 0.
+    """
+
+    def __init__(self, articles: Optional[List[Dict[str, Any]]] = None, latency: float = 0.0):
+        articles = articles if articles is not None else load_fixture("articles.json")
+        # the start of each article identifies it inside the prompt
+        self._responses = [(a["text"][:120], json.dumps(a["response"])) for a in articles]
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.models = _StubModels(self)
+        self.caches = _StubCaches()
+
+    def _respond(self, model: str, prompt: str) -> SimpleNamespace:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        text = next((resp for head, resp in self._responses if head in prompt), "{}")
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4,
+                                thoughts_token_count=0, cached_content_token_count=0)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+# ------------------------------------------------------------------------------ HTTP endpoints
+
+
+class StubServer:
+    """
+    Local HTTP server replaying article pages and Nominatim answers.
+
+    Use as a context manager; `base_url` is e.g. "http://127.0.0.1:50123" and
+    `nominatim_domain` the matching `ArticleLocationExtractor(nominatim_domain=...)`.
+
+    Parameters
+    ----------
+    articles : list of dict, optional
+        Fixture articles served at `/articles/<id>?copy=N`, by default
+        `fixtures/articles.json`. Each copy ends its paragraphs with a distinct
+        edition line, as `html_to_text` drops paragraphs it has already seen.
+    nominatim : dict, optional
+        Recorded `/search` answers by `nominatim_key`, by default `fixtures/nominatim.json`.
+    fetch_latency, geocode_latency : float, optional
+        Seconds each article / search request sleeps before answering, by default 0.
+    """
+
+    def __init__(self, articles: Optional[List[Dict[str, Any]]] = None,
+                 nominatim: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 fetch_latency: float = 0.0, geocode_latency: float = 0.0):
+        articles = articles if articles is not None else load_fixture("articles.json")
+        self.texts = {a["id"]: a["text"] for a in articles}
+        self.nominatim = nominatim if nominatim is not None else load_fixture("nominatim.json")
+        self.fetch_latency = fetch_latency
+        self.geocode_latency = geocode_latency
+        self.requests = {"articles": 0, "search": 0, "search_recorded": 0}
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.nominatim_domain}"
+
+    @property
+    def nominatim_domain(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"{host}:{port}"
+
+    def article_url(self, article_id: str, copy: int = 0) -> str:
+        return f"{self.base_url}/articles/{article_id}?copy={copy}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.requests[name] += 1
+
+    def start(self) -> "StubServer":
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoints
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path.startswith("/articles/"):
+                    stub._count("articles")
+                    text = stub.texts.get(url.path[len("/articles/"):])
+                    copy = parse_qs(url.query).get("copy", ["0"])[0]
+                    time.sleep(stub.fetch_latency)
+                    if text is None:
+                        self._send(404, b"not found", "text/plain")
+                    else:
+                        page = article_html(text, edition=copy)
+                        self._send(200, page.encode("utf-8"), "text/html; charset=utf-8")
+                elif url.path == "/search":
+                    stub._count("search")
+                    params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                    key = nominatim_key(params)
+                    places = stub.nominatim.get(key)
+                    if places is not None:
+                        stub._count("search_recorded")
+                    else:
+                        places = [synthetic_place(key, landmark=bool(params.get("q")))]
+                    time.sleep(stub.geocode_latency)
+                    self._send(200, json.dumps(places[:int(params.get("limit", 1))]).encode("utf-8"),
+                               "application/json")
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def article_html(text: str, edition: str = "0") -> str:
+    """News-site-like HTML page for an article text."""
+    paragraphs = "\n".join(f"<p>{escape(p)} (Edition {escape(edition)}.)</p>" for p in text.split("\n") if p.strip())
+    title = escape(text.split(".")[0][:80])
+    return (f"<!DOCTYPE html><html><head><title>{title}</title></head><body>"
+            f"<header><nav><a href=\"/\">Home</a></nav></header>"
+            f"<article><h1>{title}</h1>\n{paragraphs}\n</article>"
+            f"<footer>Copyright News Corp</footer></body></html>")
+
+
+# ------------------------------------------------------------------------- in-process geocode
+
+
+def _location(place: Dict[str, Any]) -> SimpleNamespace:
+    return SimpleNamespace(address=place["display_name"], latitude=float(place["lat"]),
+                           longitude=float(place["lon"]), raw=place)
+
+
+def fake_geocode(query: Any, exactly_one: bool = True, limit: Optional[int] = None, **kwargs):
+    """Geocode callable with the geopy signature, answering every query with a synthetic place."""
+    if isinstance(query, dict):
+        place = synthetic_place(nominatim_key(query))
+    else:
+        place = synthetic_place(query, landmark=True)
+    return _location(place) if exactly_one else [_location(place)]
@@ -0,0 +1,401 @@
+import hashlib
+import json
+import re
+import unicodedata
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, MutableMapping, Optional, Union
+
+from instrumentation import get_metrics
+
+# sentinel returned by `get` on a miss, so that a cached `None` (e.g. a place
+# Nominatim could not find) can be told apart from "not in the store"
+MISS = object()
+
+
+class SQLiteStore:
+    """
+    Small persistent key/value store on top of SQLite with per-entry TTLs
+    and size-bounded, least-recently-used eviction.
+
+    Values are stored as JSON, so anything `json.dumps` accepts can be cached.
+    Several stores can share one database file by using different namespaces
+    (one table each). The store is safe to use from several threads.
+
+    Parameters
+    ----------
+    path : str
+        SQLite database file, created if missing.
+    namespace : str, optional
+        Table name for this store, by default "kv".
+    ttl : float, optional
+        Default time-to-live of an entry in seconds. None means entries never expire.
+    max_entries : int, optional
+        Upper bound on the number of entries. When exceeded, the least recently
+        used entries are evicted. None means unbounded.
+    """
+
+    _EVICT_EVERY = 64  # check the size bound once every N writes
+
+    def __init__(self, path: str, namespace: str = "kv", ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", namespace):
+            raise ValueError(f"Invalid store namespace: {namespace!r}")
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {namespace} ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {namespace}_accessed ON {namespace}(accessed_at)"
+            )
+        self.purge_expired()
+        self._evict()
+
+    def get(self, key: str, default: Any = MISS) -> Any:
+        """Return the value stored under `key`, or `default` if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.namespace} WHERE key = ?", (key,)
+            ).fetchone()
+            hit = row is not None and (row[1] is None or row[1] >= now)
+            if hit:
+                self._conn.execute(
+                    f"UPDATE {self.namespace} SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                self.hits += 1
+            else:
+                self.misses += 1
+        get_metrics().inc("cache_requests_total", cache=self.namespace, result="hit" if hit else "miss")
+        return json.loads(row[0]) if hit else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value` under `key`. `ttl` overrides the store default for this entry."""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.namespace} (key, value, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self._writes += 1
+            due = self._writes % self._EVICT_EVERY == 0
+        if due:
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.namespace} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.namespace}")
+
+    def purge_expired(self) -> int:
+        """Delete expired entries and return how many were removed."""
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.namespace} WHERE expires_at IS NOT NULL AND expires_at < ?",
+                (time.time(),),
+            )
+        return cur.rowcount
+
+    def _evict(self) -> None:
+        if self.max_entries is None:
+            return
+        with self._lock:
+            (n,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.namespace}").fetchone()
+            excess = n - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self.namespace} WHERE key IN ("
+                    f" SELECT key FROM {self.namespace} ORDER BY accessed_at LIMIT ?)",
+                    (excess,),
+                )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.namespace}").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LRUMemo(MutableMapping):
+    """
+    Thread-safe in-memory mapping bounded to `max_entries`, evicting the least
+    recently used key first. Used to share results across calls in one process.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value for `key` (marking it recently used), counting hits and misses."""
+        with self._lock:
+            hit = key in self._data
+            if hit:
+                self.hits += 1
+                self._data.move_to_end(key)
+                value = self._data[key]
+            else:
+                self.misses += 1
+                value = default
+        get_metrics().inc("cache_requests_total", cache="memo", result="hit" if hit else "miss")
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._data[key]
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self._lock:
+            del self._data[key]
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlightMemo:
+    """
+    Thread-safe in-memory memo with a TTL and an LRU size bound, where
+    concurrent requests for the same missing key share a single computation.
+
+    The first caller of `get_or_compute` for a key runs `compute()`; callers
+    arriving while it runs wait for and receive its result (or its exception).
+    Exceptions are not memoized. Only ordinary `Exception`s are shared: if the
+    leader is interrupted by anything else (e.g. Streamlit's stop/rerun
+    control flow, which belongs to the leader's session), waiting callers
+    retry the computation themselves.
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Lifetime of an entry in seconds, by default 1 hour. None means no expiry.
+    max_entries : int, optional
+        Upper bound on the number of entries, by default 256.
+    """
+
+    def __init__(self, ttl: Optional[float] = 3600, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = MISS) -> Any:
+        with self._lock:
+            return self._get_locked(key, default)
+
+    def _get_locked(self, key: Hashable, default: Any) -> Any:
+        entry = self._data.get(key)
+        if entry is None or (entry[0] is not None and entry[0] < time.monotonic()):
+            self._data.pop(key, None)
+            return default
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the memoized value for `key`, computing it at most once at a time."""
+        with self._lock:
+            value = self._get_locked(key, MISS)
+            if value is not MISS:
+                self.hits += 1
+            else:
+                flight = self._in_flight.get(key)
+                leader = flight is None
+                if leader:
+                    self.misses += 1
+                    flight = self._in_flight[key] = {"done": threading.Event(), "ok": False,
+                                                     "value": None, "error": None}
+                else:
+                    self.hits += 1
+        if value is not MISS:
+            get_metrics().inc("cache_requests_total", cache="results", result="hit")
+            return value
+        get_metrics().inc("cache_requests_total", cache="results", result="miss" if leader else "shared")
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            if not flight["ok"]:
+                return self.get_or_compute(key, compute)
+            return flight["value"]
+
+        try:
+            flight["value"] = compute()
+            flight["ok"] = True
+            self.set(key, flight["value"])
+            return flight["value"]
+        except Exception as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight["done"].set()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def normalize_place_text(text: str) -> str:
+    """Lower-case, collapse whitespace and tidy commas: "paris , France" -> "paris, france"."""
+    text = re.sub(r"\s+", " ", str(text)).strip().lower()
+    return re.sub(r"\s*,\s*", ", ", text)
+
+
+def normalize_query(query: Union[str, Dict[str, str]]) -> str:
+    """Canonical string key for a free-form or structured (dict) geocode query."""
+    if isinstance(query, dict):
+        return json.dumps({k: normalize_place_text(v) for k, v in query.items()},
+                          sort_keys=True, ensure_ascii=False)
+    return normalize_place_text(query)
+
+
+class GeocodeStore(SQLiteStore):
+    """
+    Persistent place store for geocoding results.
+
+    Entries are keyed on the normalized query (structured dict or free-form
+    landmark string) plus a tag describing how the query was resolved (language,
+    strategy), and hold the chosen candidate's lat/lon/osm_id/class/type/importance.
+    Places that could not be found are remembered too, with a shorter TTL.
+
+    Parameters
+    ----------
+    path : str, optional
+        SQLite database file, by default "geocode_store.sqlite".
+    ttl : float, optional
+        Lifetime of a found place in seconds, by default 90 days.
+    miss_ttl : float, optional
+        Lifetime of a "not found" entry in seconds, by default 1 day.
+    max_entries : int, optional
+        Size bound for LRU eviction, by default 500,000 entries.
+    """
+
+    def __init__(self, path: str = "geocode_store.sqlite", ttl: float = 90*24*3600,
+                 miss_ttl: float = 24*3600, max_entries: Optional[int] = 500_000):
+        super().__init__(path, namespace="places", ttl=ttl, max_entries=max_entries)
+        self.miss_ttl = miss_ttl
+
+    @staticmethod
+    def make_key(query: Union[str, Dict[str, str]], tag: str = "") -> str:
+        return f"{tag}|{normalize_query(query)}"
+
+    def get_place(self, query: Union[str, Dict[str, str]], tag: str = "") -> Any:
+        """Return the stored record (a dict, or None for a known miss), or `MISS`."""
+        return self.get(self.make_key(query, tag))
+
+    def put_place(self, query: Union[str, Dict[str, str]], tag: str,
+                  record: Optional[Dict[str, Any]]) -> None:
+        self.set(self.make_key(query, tag), record,
+                 ttl=None if record is not None else self.miss_ttl)
+
+
+def normalize_article_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so re-flowed copies of an article hash alike."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def article_input_key(input_text: str, is_url: bool) -> str:
+    """Memo key of a pipeline input: the URL itself, or a hash of the normalized article text."""
+    if is_url:
+        return "url|" + input_text.strip()
+    return "text|" + hashlib.sha256(normalize_article_text(input_text).encode("utf-8")).hexdigest()
+
+
+class LLMResultCache(SQLiteStore):
+    """
+    Persistent cache of parsed LLM location extractions.
+
+    Entries are keyed on a SHA-256 of the normalized article text, the model
+    name and the prompt-template version, so syndicated copies of the same
+    wire story (or a re-click in the UI) are answered without an API call, and
+    changing the model or prompt naturally invalidates old results.
+    Only complete extractions are stored: failed calls raise
+    `ExtractionFailed` before reaching the cache. An empty result ({}) is a
+    genuine "no locations" answer, kept for a shorter `empty_ttl` since a
+    model missing every place is also the most likely answer to change.
+
+    Parameters
+    ----------
+    path : str, optional
+        SQLite database file, by default "llm_cache.sqlite".
+    ttl : float, optional
+        Lifetime of an entry in seconds, by default 30 days.
+    empty_ttl : float, optional
+        Lifetime of a result without locations in seconds, by default 1 hour.
+    max_entries : int, optional
+        Size bound for LRU eviction, by default 50,000 entries.
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite", ttl: float = 30*24*3600,
+                 empty_ttl: float = 3600, max_entries: Optional[int] = 50_000):
+        super().__init__(path, namespace="llm_results", ttl=ttl, max_entries=max_entries)
+        self.empty_ttl = empty_ttl
+
+    @staticmethod
+    def make_key(text: str, model_name: str, prompt_version: str, variant: str = "") -> str:
+        digest = hashlib.sha256(normalize_article_text(text).encode("utf-8")).hexdigest()
+        return f"{model_name}|{prompt_version}|{variant}|{digest}"
+
+    def get_result(self, text: str, model_name: str, prompt_version: str, variant: str = "") -> Any:
+        """Return the cached locations dict, or `MISS`."""
+        return self.get(self.make_key(text, model_name, prompt_version, variant))
+
+    def put_result(self, text: str, model_name: str, prompt_version: str,
+                   result: Dict[str, Any], variant: str = "") -> None:
+        self.set(self.make_key(text, model_name, prompt_version, variant), result,
+                 ttl=None if result else self.empty_ttl)
@@ -0,0 +1,345 @@
+import csv
+import hashlib
+import pickle
+import re
+import sys
+import unicodedata
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Common names the LLM uses for countries that are neither the GeoNames
+# country name nor an ISO code.
+COUNTRY_ALIASES = {
+    "usa": "US", "us": "US", "united states of america": "US", "america": "US",
+    "uk": "GB", "great britain": "GB", "england": "GB", "scotland": "GB", "wales": "GB",
+    "northern ireland": "GB", "russia": "RU", "south korea": "KR", "north korea": "KP",
+    "iran": "IR", "syria": "SY", "vietnam": "VN", "laos": "LA", "bolivia": "BO",
+    "venezuela": "VE", "tanzania": "TZ", "czech republic": "CZ", "czechia": "CZ",
+    "ivory coast": "CI", "the netherlands": "NL", "holland": "NL", "uae": "AE",
+    "palestine": "PS", "taiwan": "TW", "moldova": "MD", "macedonia": "MK",
+}
+
+# when several places match a query, the most populous one is only taken if it
+# has at least this many times the population of the next ("Paris, France" vs
+# a hamlet called Paris); otherwise ("Springfield, USA") the query is ambiguous
+DOMINANT_POPULATION_RATIO = 10
+
+# feature kinds kept in the index
+CITY, ADM2, ADM1, COUNTRY = 0, 1, 2, 3
+KIND_TYPES = {CITY: "city", ADM2: "county", ADM1: "state", COUNTRY: "country"}
+KIND_CLASSES = {CITY: "place", ADM2: "boundary", ADM1: "boundary", COUNTRY: "boundary"}
+
+_ADMIN_SUFFIXES = re.compile(r"\s+(county|parish|borough|district|department|province|region|prefecture)$")
+
+
+def fold_name(name: str) -> str:
+    """ASCII-fold and normalize a place name: "Île-de-France" -> "ile de france"."""
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(ch for ch in name if not unicodedata.combining(ch)).lower()
+    name = re.sub(r"[’'`.]", "", name)
+    name = re.sub(r"[^a-z0-9]+", " ", name)
+    return name.strip()
+
+
+class LocalGazetteer:
+    """
+    Offline gazetteer built from GeoNames dump files, used as a first-tier
+    geocoder before Nominatim.
+
+    The index keeps one compact record per feature (cities, admin1/admin2
+    regions and countries) in parallel arrays, plus a dict from ASCII-folded
+    name/alias to feature ids. Resolving a structured query is a few dict
+    lookups, so no network and no rate limit is involved. Landmarks are not
+    covered and queries that cannot be resolved unambiguously return None,
+    letting the caller fall back to Nominatim.
+
+    Build it with `from_geonames` from the files at
+    https://download.geonames.org/export/dump/ :
+      - `cities500.txt` / `cities15000.txt` (populated places) or `allCountries.txt`
+        (also contains ADM1/ADM2/PCLI features with coordinates),
+      - `admin1CodesASCII.txt`, `admin2Codes.txt` (admin region names),
+      - `countryInfo.txt` (country names, ISO codes).
+    `save`/`load` pickle the built index for fast start-up.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.kind = array("b")
+        self.lat = array("d")
+        self.lon = array("d")
+        self.population = array("q")
+        self.country_code: List[str] = []
+        self.admin1_code: List[str] = []
+        self.admin2_code: List[str] = []
+        self.index: Dict[str, List[int]] = defaultdict(list)
+        self.country_names: Dict[str, str] = {}             # cc -> country name
+        self.country_lookup: Dict[str, str] = {}            # folded name/ISO -> cc
+        self.admin1_names: Dict[Tuple[str, str], str] = {}  # (cc, a1) -> name
+        self.admin2_names: Dict[Tuple[str, str, str], str] = {}
+        self.admin1_lookup: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self.admin2_lookup: Dict[str, Set[Tuple[str, str, str]]] = defaultdict(set)
+
+    # ------------------------------------------------------------------ building
+
+    @classmethod
+    def from_geonames(
+        cls,
+        features_path: str,
+        admin1_path: Optional[str] = None,
+        admin2_path: Optional[str] = None,
+        country_info_path: Optional[str] = None,
+        min_population: int = 0,
+        alternate_names: bool = True,
+    ) -> "LocalGazetteer":
+        """
+        Build the index from GeoNames dump files.
+
+        Parameters
+        ----------
+        features_path : str
+            Main GeoNames table (e.g. `cities500.txt` or `allCountries.txt`).
+        admin1_path, admin2_path, country_info_path : str, optional
+            Name tables for admin regions and countries. Without the admin
+            tables, states and counties cannot be matched by name. Without
+            `country_info_path`, countries are not matched by name nor by ISO
+            code, only by the common `COUNTRY_ALIASES` ("USA", "UK", ...), and
+            are displayed by their ISO code.
+        min_population : int, optional
+            Skip populated places below this population, by default 0.
+        alternate_names : bool, optional
+            Also index the alias column (other spellings/languages), by default True.
+        """
+        gaz = cls()
+        if country_info_path:
+            gaz._load_country_info(country_info_path)
+        for alias, cc in COUNTRY_ALIASES.items():
+            gaz.country_lookup.setdefault(alias, cc)
+        if admin1_path:
+            for row in _read_tsv(admin1_path):
+                if len(row) < 3:
+                    continue
+                cc, a1 = row[0].split(".", 1)
+                gaz.admin1_names[(cc, a1)] = row[1]
+                for n in {row[1], row[2]}:
+                    gaz.admin1_lookup[fold_name(n)].add((cc, a1))
+        if admin2_path:
+            for row in _read_tsv(admin2_path):
+                if len(row) < 3:
+                    continue
+                cc, a1, a2 = row[0].split(".", 2)
+                gaz.admin2_names[(cc, a1, a2)] = row[1]
+                for n in {row[1], row[2]}:
+                    folded = fold_name(n)
+                    gaz.admin2_lookup[folded].add((cc, a1, a2))
+                    gaz.admin2_lookup[_ADMIN_SUFFIXES.sub("", folded)].add((cc, a1, a2))
+        gaz._load_features(features_path, min_population, alternate_names)
+        gaz.index = dict(gaz.index)
+        gaz.admin1_lookup = dict(gaz.admin1_lookup)
+        gaz.admin2_lookup = dict(gaz.admin2_lookup)
+        return gaz
+
+    def _load_country_info(self, path: str) -> None:
+        for row in _read_tsv(path):
+            if len(row) < 5:
+                continue
+            cc, iso3, name = row[0], row[1], row[4]
+            self.country_names[cc] = name
+            for key in (cc, iso3, name):
+                self.country_lookup[fold_name(key)] = cc
+
+    def _load_features(self, path: str, min_population: int, alternate_names: bool) -> None:
+        for row in _read_tsv(path):
+            if len(row) < 15:
+                continue
+            fclass, fcode = row[6], row[7]
+            if fclass == "P":
+                kind = CITY
+            elif fclass == "A" and fcode == "ADM1":
+                kind = ADM1
+            elif fclass == "A" and fcode == "ADM2":
+                kind = ADM2
+            elif fclass == "A" and fcode.startswith("PCL"):
+                kind = COUNTRY
+            else:
+                continue
+            population = int(row[14] or 0)
+            if kind == CITY and population < min_population:
+                continue
+
+            fid = len(self.names)
+            self.names.append(row[1])
+            self.kind.append(kind)
+            self.lat.append(float(row[4]))
+            self.lon.append(float(row[5]))
+            self.population.append(population)
+            self.country_code.append(row[8])
+            self.admin1_code.append(row[10])
+            self.admin2_code.append(row[11])
+
+            keys = {fold_name(row[1]), fold_name(row[2])}
+            if alternate_names and row[3]:
+                keys.update(fold_name(a) for a in row[3].split(",") if len(a) < 60)
+            if kind in (ADM1, ADM2):
+                keys.update({_ADMIN_SUFFIXES.sub("", k) for k in keys})
+            for key in keys:
+                if key:
+                    self.index[key].append(fid)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalGazetteer":
+        gaz = cls()
+        with open(path, "rb") as f:
+            gaz.__dict__.update(pickle.load(f))
+        return gaz
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # ----------------------------------------------------------------- resolving
+
+    def resolve_country(self, name: str) -> Optional[str]:
+        """Return the ISO country code for a country name/alias/code, or None."""
+        return self.country_lookup.get(fold_name(name))
+
+    def lookup(self, name: str, kind: Optional[int] = None) -> List[int]:
+        """Return the feature ids indexed under `name`, optionally of one kind."""
+        fids = self.index.get(fold_name(name), [])
+        return [f for f in fids if kind is None or self.kind[f] == kind]
+
+    def resolve(self, q: Dict[str, str]) -> Optional[Dict[str, object]]:
+        """
+        Resolve a structured query (keys among 'city', 'county', 'state',
+        'country') to a geocode record, or None when the gazetteer has no
+        unambiguous answer.
+
+        Candidates are filtered by the given country, state and county (a
+        county that matches none of them is ignored). If several remain, the
+        most populous is only returned when it has `DOMINANT_POPULATION_RATIO`
+        times the population of the next; otherwise the query is ambiguous
+        ("Springfield, USA") and None lets Nominatim decide.
+
+        Returns
+        -------
+        Dict or None
+            Same fields as a Nominatim result in `geocode_nominatim`:
+            display_name, lat, lon, osm_id (None), class, type, importance (None).
+        """
+        cc = None
+        if q.get("country"):
+            cc = self.resolve_country(q["country"])
+            if cc is None:
+                return None
+        admin1 = None
+        if q.get("state"):
+            admin1 = {k for k in self.admin1_lookup.get(fold_name(q["state"]), ()) if cc is None or k[0] == cc}
+            if not admin1:
+                return None
+        admin2 = None
+        if q.get("county"):
+            admin2 = {k for k in self.admin2_lookup.get(fold_name(q["county"]), ())
+                      if (cc is None or k[0] == cc) and (admin1 is None or k[:2] in admin1)}
+
+        if q.get("city"):
+            target, kind = q["city"], CITY
+        elif q.get("county"):
+            target, kind = q["county"], ADM2
+        elif q.get("state"):
+            target, kind = q["state"], ADM1
+        elif cc:
+            target, kind = None, COUNTRY
+        else:
+            return None
+
+        if target is None:
+            cands = [self._country_feature[cc]] if cc in self._country_feature else []
+        else:
+            cands = self.lookup(target, kind)
+
+        matches = []
+        for f in cands:
+            fcc, fa1, fa2 = self.country_code[f], self.admin1_code[f], self.admin2_code[f]
+            if cc is not None and fcc != cc:
+                continue
+            if admin1 is not None and (fcc, fa1) not in admin1:
+                continue
+            matches.append(f)
+        if admin2:
+            in_county = [f for f in matches
+                         if (self.country_code[f], self.admin1_code[f], self.admin2_code[f]) in admin2]
+            matches = in_county or matches
+        if not matches:
+            return None
+        matches.sort(key=lambda f: self.population[f], reverse=True)
+        if len(matches) > 1 and self.population[matches[0]] < DOMINANT_POPULATION_RATIO * max(1, self.population[matches[1]]):
+            return None
+        return self._record(matches[0])
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the index contents, identifying this build in cache keys."""
+        cached = self.__dict__.get("_fingerprint_cache")
+        if cached is None:
+            summary = (len(self.names), sum(self.population), round(sum(self.lat), 3), round(sum(self.lon), 3),
+                       len(self.index), len(self.admin1_names), len(self.admin2_names), len(self.country_names))
+            cached = hashlib.sha1(repr(summary).encode("utf-8")).hexdigest()[:12]
+            self.__dict__["_fingerprint_cache"] = cached
+        return cached
+
+    @property
+    def _country_feature(self) -> Dict[str, int]:
+        # lazily built map cc -> country feature id
+        cached = self.__dict__.get("_country_feature_cache")
+        if cached is None:
+            cached = {}
+            for f in range(len(self.names)):
+                if self.kind[f] == COUNTRY:
+                    cached.setdefault(self.country_code[f], f)
+            self.__dict__["_country_feature_cache"] = cached
+        return cached
+
+    def _record(self, f: int) -> Dict[str, object]:
+        cc, a1, a2 = self.country_code[f], self.admin1_code[f], self.admin2_code[f]
+        kind = self.kind[f]
+        parts = [self.names[f]]
+        if kind == CITY and (cc, a1, a2) in self.admin2_names:
+            parts.append(self.admin2_names[(cc, a1, a2)])
+        if kind in (CITY, ADM2) and (cc, a1) in self.admin1_names:
+            parts.append(self.admin1_names[(cc, a1)])
+        if kind != COUNTRY and cc in self.country_names:
+            parts.append(self.country_names[cc])
+        return {
+            "display_name": ", ".join(parts),
+            "lat": self.lat[f],
+            "lon": self.lon[f],
+            "osm_id": None,
+            "class": KIND_CLASSES[kind],
+            "type": KIND_TYPES[kind],
+            "importance": None,
+        }
+
+
+def _read_tsv(path: str) -> Iterable[List[str]]:
+    csv.field_size_limit(sys.maxsize)
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if row and not row[0].startswith("#"):
+                yield row
+
+
+if __name__ == "__main__":
+    # ---- Example usage ----
+    # wget https://download.geonames.org/export/dump/{cities15000.zip,admin1CodesASCII.txt,admin2Codes.txt,countryInfo.txt}
+    gaz = LocalGazetteer.from_geonames("cities15000.txt", "admin1CodesASCII.txt",
+                                       "admin2Codes.txt", "countryInfo.txt")
+    gaz.save("gazetteer.pkl")
+    print(f"{len(gaz)} features indexed")
+    for q in [{"city": "Paris", "country": "France"},
+              {"city": "San Francisco", "state": "California", "country": "USA"},
+              {"city": "Seattle", "county": "King", "state": "Washington", "country": "USA"},
+              {"city": "Melbourne", "state": "Victoria", "country": "Australia"}]:
+        print(q, "->", gaz.resolve(q))
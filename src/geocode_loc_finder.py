@@ -1,20 +1,75 @@
 from geopy.geocoders import Nominatim
+from geopy.adapters import RequestsAdapter
 from geopy.extra.rate_limiter import RateLimiter
 import requests_cache, pandas as pd
 from tqdm import tqdm
-from typing import Dict, List, Callable, Any
+from typing import Dict, List, Callable, Any, Optional, MutableMapping, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache_store import GeocodeStore, MISS, normalize_query
+from gazetteer import LocalGazetteer
+from instrumentation import get_metrics
+from location_table import LocationTable
+
+# per-row result columns filled from the chosen geocoding candidate
+RESULT_FIELDS = ["display_name", "lat", "lon", "osm_id", "class", "type", "importance"]
+_NO_RECORD = dict.fromkeys(RESULT_FIELDS)
+
+
+class CachedRequestsAdapter(RequestsAdapter):
+    """
+    geopy adapter whose session is a `requests_cache.CachedSession`, so HTTP
+    caching applies to geocoder requests only, in the "geocode_cache" namespace,
+    instead of patching every `requests` call in the process.
+
+    Use it with `Nominatim(..., adapter_factory=CachedRequestsAdapter)`.
+    """
+    cache_name = "geocode_cache"
+    expire_after = 7*24*3600
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        session = requests_cache.CachedSession(self.cache_name, expire_after=self.expire_after)
+        session.trust_env = self.session.trust_env
+        session.proxies = self.session.proxies
+        for prefix, adapter in self.session.adapters.items():
+            session.mount(prefix, adapter)
+        self.session = session
+
+
+def _location_record(loc: Any) -> Optional[Dict[str, Any]]:
+    """Reduce a geopy `Location` to the fields we keep (and store)."""
+    if not loc:
+        return None
+    return {
+        "display_name": loc.address,
+        "lat": float(loc.latitude),
+        "lon": float(loc.longitude),
+        "osm_id": loc.raw.get("osm_id"),
+        "class": loc.raw.get("class"),         # e.g., "place"
+        "type": loc.raw.get("type"),           # e.g., "village"
+        "importance": loc.raw.get("importance"),
+    }
 
 
 def geocode_nominatim(
     inp_dict: Dict[str, List[str]],
     geocode: Callable[..., Any],
     lang: str = "en",
-    test_mode: bool = False
-    ) -> List[Dict[str, Any]]:
+    test_mode: bool = False,
+    store: Optional[GeocodeStore] = None,
+    memo: Optional[MutableMapping[str, Any]] = None,
+    gazetteer: Optional[LocalGazetteer] = None,
+    max_workers: int = 1,
+    landmark_mode: str = "sequential",
+    on_row: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    as_table: bool = False,
+    ) -> Union[pd.DataFrame, LocationTable]:
     
     """
     Geocode structured location fields row-by-row using a Nominatim `geocode` callable.
     The input is a dictionary of parallel lists describing locations found in text.
+    Rows repeating the same place are collapsed to one query and geocoded once.
 
     Parameters
     ----------
@@ -25,18 +80,56 @@ def geocode_nominatim(
         A callable compatible with `geopy`'s Nominatim `geocode` signature
         (often a `RateLimiter` wrapper). It should accept either a string or a
         structured dict query and return a `Location` or a list of `Location`s.
+        It should raise on errors (timeouts, HTTP 5xx) rather than return None
+        (`swallow_exceptions=False`): a raised error leaves the row unresolved
+        for this call only, while None is a miss remembered in `store` and `memo`.
     lang : str, optional
         Preferred language code for geocoding (passed along when the callable supports it),
         by default "en".
     test_mode : bool, optional
         If True, print debugging information, by default False.
+    store : GeocodeStore, optional
+        Persistent place store. Queries found there (including known misses)
+        are answered without calling `geocode`, so they cost no network request
+        and no rate-limiter sleep. New results are written back. By default None.
+    memo : MutableMapping, optional
+        In-memory map from row query key to result, shared across calls to
+        deduplicate geocoding across many articles (e.g. an `LRUMemo`).
+        Rows within one call are always deduplicated. By default None.
+    gazetteer : LocalGazetteer, optional
+        Offline first-tier geocoder for non-landmark rows. Only the rows it
+        cannot resolve (and all landmarks) go to the store / `geocode`. By default None.
+    max_workers : int, optional
+        Number of threads resolving unique queries concurrently. Only useful when
+        `geocode` is thread-safe and its endpoint allows parallel requests (e.g. a
+        `RateLimitedGeocoder` in front of a self-hosted Nominatim). Output rows keep
+        the input order. By default 1.
+    landmark_mode : str, optional
+        "sequential" tries the free-form landmark queries one after another
+        ("lm, city, state", then "lm, state", then "lm, country") and stops at the
+        first hit. "speculative" sends all applicable queries at once and keeps the
+        most specific one that succeeded: fewer round-trips of latency, but more
+        requests, so only use it against endpoints that allow concurrency.
+        By default "sequential".
+    on_row : Callable[[int, Dict[str, Any]], None], optional
+        Called as `on_row(row_index, row)` on the calling thread as soon as each
+        input row is resolved (in completion order), with the same fields as the
+        row of the returned DataFrame. Lets callers show results progressively.
+        By default None.
+    as_table : bool, optional
+        Return the compact columnar `LocationTable` the results are collected
+        in (float coordinates, dictionary-encoded text; exports to Parquet/Arrow)
+        instead of converting it to a DataFrame. By default False.
 
     Returns
     -------
-    List[Dict[str, Any]]
-        A list of per-row geocoding results (e.g., chosen candidate metadata such
-        as name, latitude/longitude, and raw OSM fields). The exact shape of each
-        dict depends on how results are assembled later in the function.
+    pd.DataFrame or LocationTable
+        One row per input row: the input columns, the chosen candidate's
+        `RESULT_FIELDS` (display name, lat/lon, OSM id, class, type, importance;
+        None when not found), `strategy` and `map_name`, the label shown on the
+        map. The `strategy` column records how each row was resolved ("gazetteer",
+        "structured", "landmark1"/"landmark2"/"landmark3", or None if not found),
+        so the landmark cascade order can be tuned from data.
 
     Raises
     ------
@@ -71,12 +164,11 @@ def geocode_nominatim(
                 return c
         return cands[0]  # fallback to first
 
-    out = []
-    for qix in tqdm(range(len(inp_dict['cities']))):
-
+    def _row_query(qix, verbose=False):
         q = {
-            # Structured query greatly improves accuracy
-            place_type:place[qix] for place_type,place in f_inp_dict.items() if place[qix]!= "None"
+            # Structured query greatly improves accuracy (summary is not a place field)
+            place_type:place[qix] for place_type,place in f_inp_dict.items()
+            if place[qix]!= "None" and place_type != "summary"
         }
 
         # Handle San Francisco-like cases where city == county in non-landmark queries
@@ -84,13 +176,26 @@ def geocode_nominatim(
             q['city'].lower() == q['county'].lower()):
             # Remove county from query to avoid confusion
             del q['county']
-            if test_mode:
+            if verbose:
                 print(f"Removed duplicate county for city: {q['city']}")
+        return q
+
+    def _row_key(qix):
+        # rows resolving to the same key share one geocoding result
+        lm = inp_dict["landmarks"][qix]
+        if lm is not None and lm != "None":
+            ctx = [inp_dict[k][qix] for k in ("cities", "states", "countries")]
+            return f"{lang}|landmark|" + normalize_query(", ".join([lm] + ctx))
+        return f"{lang}|structured|" + normalize_query(_row_query(qix))
+
+    def _resolve_row(qix):
+        q = _row_query(qix, verbose=test_mode)
 
         # detect if we have a landmark this row and classify it
         lm = f_inp_dict.get("q", [None])[qix]
         has_landmark = (lm is not None and lm != "None")
         is_natural = _is_natural_landmark(lm) if has_landmark else False
+        failed = False  # a geocode call raised: the result is not a real miss and must not be remembered
 
     
         # --------------------------------------------------------------------------------------------
@@ -98,68 +203,70 @@ def geocode_nominatim(
         # --------------------------------------------------------------------------------------------
 
         if has_landmark:
-            # FIXED: Use free-form text queries for landmarks instead of structured queries
-            loc = None
-            
+            # Use free-form text queries for landmarks instead of structured queries
             # Get context for building free-form query
             city = inp_dict["cities"][qix] if inp_dict["cities"][qix] != "None" else None
             state = inp_dict["states"][qix] if inp_dict["states"][qix] != "None" else None
             country = inp_dict["countries"][qix] if inp_dict["countries"][qix] != "None" else None
-            
-            # Strategy 1: Free-form landmark + city, state (most specific)
-            if city and state:
-                freeform_query = f"{lm}, {city}, {state}"
-                try:
-                    cands = geocode(freeform_query, language=lang, addressdetails=True,
-                                             extratags=True, exactly_one=False, limit=5, timeout=10)
-                    if cands:
-                        # Filter out results that are just cities/states/countries
-                        filtered_cands = [c for c in cands if c.raw.get("class") not in ["place"] or 
-                                        c.raw.get("type") not in ["city", "state", "country"]]
-                        if filtered_cands:
-                            if test_mode:
-                                print(f"Strategy 1 - Found {len(filtered_cands)} landmark candidates for '{lm}'")
-                            loc = _choose_landmark_candidate(filtered_cands, is_natural)
-                except Exception as e:
-                    if test_mode:
-                        print(f"Strategy 1 failed for '{lm}': {e}")
-            
-            # Strategy 2: Free-form landmark + state only
-            if not loc and state:
-                freeform_query = f"{lm}, {state}"
+
+            strategies = [
+                # Strategy 1: Free-form landmark + city, state (most specific)
+                # Filter out results that are just cities/states/countries
+                (1, f"{lm}, {city}, {state}" if city and state else None,
+                 lambda c: c.raw.get("class") not in ["place"] or c.raw.get("type") not in ["city", "state", "country"]),
+                # Strategy 2: Free-form landmark + state only, filter out state/country results
+                (2, f"{lm}, {state}" if state else None,
+                 lambda c: c.raw.get("class") not in ["place"] or c.raw.get("type") not in ["state", "country"]),
+                # Strategy 3: Free-form landmark + country, filter out country results
+                (3, f"{lm}, {country}" if country else None,
+                 lambda c: c.raw.get("type") != "country"),
+            ]
+
+            def _run_strategy(n, freeform_query, keep):
+                # returns (record, resolved); resolved is False on a transient failure
+                tag = f"{lang}|landmark{n}"
+                if store is not None:
+                    cached = store.get_place(freeform_query, tag)
+                    if cached is not MISS:
+                        return cached, True
                 try:
-                    cands = geocode(freeform_query, language=lang, addressdetails=True,
-                                             extratags=True, exactly_one=False, limit=5, timeout=10)
-                    if cands:
-                        # Filter out state/country results
-                        filtered_cands = [c for c in cands if c.raw.get("class") not in ["place"] or 
-                                        c.raw.get("type") not in ["state", "country"]]
-                        if filtered_cands:
-                            if test_mode:
-                                print(f"Strategy 2 - Found {len(filtered_cands)} landmark candidates for '{lm}'")
-                            loc = _choose_landmark_candidate(filtered_cands, is_natural)
+                    with get_metrics().timer("geocode_strategy_seconds", strategy=f"landmark{n}"):
+                        cands = geocode(freeform_query, language=lang, addressdetails=True,
+                                        extratags=True, exactly_one=False, limit=5, timeout=10)
                 except Exception as e:
                     if test_mode:
-                        print(f"Strategy 2 failed for '{lm}': {e}")
-            
-            # Strategy 3: Free-form landmark + country
-            if not loc and country:
-                freeform_query = f"{lm}, {country}"
-                try:
-                    cands = geocode(freeform_query, language=lang, addressdetails=True,
-                                             extratags=True, exactly_one=False, limit=5, timeout=10)
-                    if cands:
-                        # Filter out country results
-                        filtered_cands = [c for c in cands if c.raw.get("type") != "country"]
-                        if filtered_cands:
-                            if test_mode:
-                                print(f"Strategy 3 - Found {len(filtered_cands)} landmark candidates for '{lm}'")
-                            loc = _choose_landmark_candidate(filtered_cands, is_natural)
-                except Exception as e:
+                        print(f"Strategy {n} failed for '{lm}': {e}")
+                    return None, False  # do not remember it as a miss
+                record = None
+                filtered_cands = [c for c in (cands or []) if keep(c)]
+                if filtered_cands:
                     if test_mode:
-                        print(f"Strategy 3 failed for '{lm}': {e}")
-                    
-            if not loc:
+                        print(f"Strategy {n} - Found {len(filtered_cands)} landmark candidates for '{lm}'")
+                    record = _location_record(_choose_landmark_candidate(filtered_cands, is_natural))
+                if store is not None:
+                    store.put_place(freeform_query, tag, record)
+                return record, True
+
+            applicable = [s for s in strategies if s[1]]
+            record, strategy = None, None
+            if landmark_mode == "speculative" and len(applicable) > 1:
+                # fire every strategy at once, keep the most specific one that succeeded
+                with ThreadPoolExecutor(max_workers=len(applicable)) as pool:
+                    attempts = list(pool.map(lambda s: _run_strategy(*s), applicable))
+                for (n, _, _), (rec, resolved) in zip(applicable, attempts):
+                    failed = failed or not resolved
+                    if rec:
+                        record, strategy = rec, f"landmark{n}"
+                        break
+            else:
+                for n, freeform_query, keep in applicable:
+                    record, resolved = _run_strategy(n, freeform_query, keep)
+                    failed = failed or not resolved
+                    if record:
+                        strategy = f"landmark{n}"
+                        break
+
+            if not record:
                 if test_mode:
                     print(f"All strategies failed for landmark: {lm}")
                 
@@ -168,37 +275,94 @@ def geocode_nominatim(
         # --------------------------------------------------------------------------------------------
         
         else:
-            loc = geocode(q, language=lang, addressdetails=False)  # simple, single best
-
-        if loc:
-            out.append({
-                **{place_type:place[qix] for place_type,place in inp_dict.items()},
-                "source": "nominatim",
-                "display_name": loc.address,
-                "lat": float(loc.latitude),
-                "lon": float(loc.longitude),
-                "osm_id": loc.raw.get("osm_id"),
-                "class": loc.raw.get("class"),         # e.g., "place"
-                "type": loc.raw.get("type"),           # e.g., "village"
-                "importance": loc.raw.get("importance"),
-            })
-        else:
-            out.append({**{place_type:place[qix] for place_type,place in inp_dict.items()}, "source": "nominatim", "display_name": None, "lat": None, "lon": None, "osm_id": None, "class": None, "type": None, "importance": None})
-    df_out = pd.DataFrame(out)
-
-    # Building map name display from available info
-    df_out['dis_name_temp'] = [x.split(',')[0] if x is not None else None for x in df_out['display_name'] ]
-    order = ["dis_name_temp", "landmarks", "cities", "provinces_counties", "states", "countries"]
-    df_out["map_name"] = (
-        df_out[order]
-        .replace("None", pd.NA)   # treat "None" as missing
-        .bfill(axis=1)            # take first non-missing from left to right
-        .iloc[:, 0]               # that first value
-        .fillna("None")           # (optional) keep "None" if all are missing
-    )
-    df_out.drop(columns=['source', 'dis_name_temp'], inplace=True)
+            tag = f"{lang}|structured"
+            record = None
+            if gazetteer is not None:
+                with get_metrics().timer("geocode_strategy_seconds", strategy="gazetteer"):
+                    record = gazetteer.resolve(q)
+            strategy = "gazetteer"
+            if record is None:
+                strategy = "structured"
+                record = store.get_place(q, tag) if store is not None else MISS
+                if record is MISS:
+                    try:
+                        with get_metrics().timer("geocode_strategy_seconds", strategy="structured"):
+                            record = _location_record(geocode(q, language=lang, addressdetails=False))  # simple, single best
+                    except Exception as e:
+                        if test_mode:
+                            print(f"Structured query failed for {q}: {e}")
+                        record, failed = None, True
+                    if store is not None and not failed:
+                        store.put_place(q, tag, record)
+        return (record, (strategy if record else None)), failed
+
+    # Collapse rows to unique queries, geocode each once, then fan results back out
+    n_rows = len(inp_dict['cities'])
+    row_keys = [_row_key(qix) for qix in range(n_rows)]
+    first_row = {}
+    for qix, key in enumerate(row_keys):
+        first_row.setdefault(key, qix)
+    if test_mode:
+        print(f"{n_rows} rows -> {len(first_row)} unique geocode queries")
+
+    def _resolve_key(item):
+        key, qix = item
+        cached = memo.get(key, MISS) if memo is not None else MISS
+        if cached is not MISS:
+            return cached
+        resolved, failed = _resolve_row(qix)
+        if memo is not None and not failed:
+            memo[key] = resolved
+        return resolved
+
+    def _output_row(qix, resolved):
+        # one row as a dict, only built for `on_row`
+        record, strategy = resolved
+        row = {
+            **{place_type:place[qix] for place_type,place in inp_dict.items()},
+            **(record or dict.fromkeys(RESULT_FIELDS)),
+            "strategy": strategy,
+        }
+        # Building map name display from available info: first non-missing of
+        # the display name's first part, landmark, city, county, state, country
+        dis_name = row["display_name"].split(',')[0] if row["display_name"] is not None else None
+        candidates = [dis_name] + [row[k] for k in ("landmarks", "cities", "provinces_counties", "states", "countries")]
+        row["map_name"] = next((c for c in candidates if c is not None and c != "None"), "None")
+        return row
+
+    rows_of_key = {}
+    for qix, key in enumerate(row_keys):
+        rows_of_key.setdefault(key, []).append(qix)
+    # per row, a reference to its key's (record, strategy); the columns are built once at the end
+    resolved_rows = [None] * n_rows
+
+    def _fan_out(key, resolved):
+        for qix in rows_of_key[key]:
+            resolved_rows[qix] = resolved
+            if on_row is not None:
+                on_row(qix, _output_row(qix, resolved))
+
+    items = list(first_row.items())
+    if max_workers > 1 and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_resolve_key, item): item[0] for item in items}
+            for fut in tqdm(as_completed(futures), total=len(items)):
+                _fan_out(futures[fut], fut.result())
+    else:
+        for item in tqdm(items):
+            _fan_out(item[0], _resolve_key(item))
+
+    table = LocationTable(inp_dict)
+    records = [record or _NO_RECORD for record, _ in resolved_rows]
+    for field in RESULT_FIELDS:
+        table.add_column(field, (record[field] for record in records))
+    table.add_column("strategy", (strategy for _, strategy in resolved_rows))
+    table.add_map_name()
+    if as_table:
+        return table
+    df_out = table.to_dataframe() if n_rows else pd.DataFrame()
     if test_mode:
-        print(f"\n{'#'*20}\noutput from geocode: {pd.DataFrame(out).to_markdown()}\n{'#'*20}")
+        print(f"\n{'#'*20}\noutput from geocode: {df_out.to_markdown()}\n{'#'*20}")
     return df_out
 
 
@@ -230,9 +394,8 @@ if __name__ == "__main__":
     "summary": ["Something here"]*22
 }
     # Cache responses to be kind to the service and for speed
-    requests_cache.install_cache("geocode_cache", expire_after=7*24*3600)
-    geolocator = Nominatim(user_agent='test', timeout=10)
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.0, max_retries=2, error_wait_seconds=2.0, swallow_exceptions=True)
+    geolocator = Nominatim(user_agent='test', timeout=10, adapter_factory=CachedRequestsAdapter)
+    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.0, max_retries=2, error_wait_seconds=2.0, swallow_exceptions=False)
 
     df_out = geocode_nominatim(data, geocode, test_mode = True)
     print(df_out[['cities','provinces_counties','states', 'countries','landmarks','display_name', 'map_name', 'lat','lon']])
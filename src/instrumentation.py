@@ -0,0 +1,214 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional, Tuple
+
+METRIC_PREFIX = "news_to_map_"
+# histogram buckets in seconds, from a cache hit to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Metrics recorded by the pipeline:
+#   stage_seconds{stage}                 fetch, parse, llm, geocode, map, article (whole process_article)
+#   llm_request_seconds{model}           one Gemini generate_content call (repairs included)
+#   geocode_strategy_seconds{strategy}   gazetteer, structured, landmark1..3
+#   cache_requests_total{cache,result}   hit / miss of every SQLite store and in-memory memo
+#   geocode_requests_total               requests let through the rate limiter
+#   rate_limit_sleep_seconds_total       time spent waiting for the rate limiter
+#   retries_total{category}              failed LLM attempts by error category
+#   retry_backoff_seconds_total          time slept between LLM attempts
+#   articles_total{result}               processed articles: ok or the exception name
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and timing histograms, with pluggable outputs.
+
+    - `to_prometheus()` renders everything in the Prometheus text format
+      (`serve_prometheus` exposes it on `/metrics`),
+    - sinks added with `add_sink` receive every observation as a dict, e.g.
+      `json_log_sink(sys.stderr)` for structured JSON-lines logs,
+    - with `enable_opentelemetry()`, every `timer` block is also an
+      OpenTelemetry span (nested spans follow the call structure).
+
+    Parameters
+    ----------
+    buckets : tuple of float, optional
+        Histogram bucket bounds in seconds, by default `DEFAULT_BUCKETS`.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}  # bucket counts + [sum, count]
+        self._sinks: List[Callable[[Dict[str, Any]], None]] = []
+        self._tracer = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ recording
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        """Add `value` to the counter `name`."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+        self._emit("counter", name, value, labels)
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record one duration in the histogram `name`."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            h = series.get(key)
+            if h is None:
+                h = series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    h[i] += 1
+            h[-2] += seconds
+            h[-1] += 1
+        self._emit("timer", name, seconds, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Time the enclosed block into the histogram `name` (and an OpenTelemetry span if enabled)."""
+        span = self._tracer.start_as_current_span(name, attributes={k: str(v) for k, v in labels.items()}) \
+            if self._tracer is not None else None
+        start = time.perf_counter()
+        try:
+            if span is None:
+                yield
+            else:
+                with span:
+                    yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # -------------------------------------------------------------------- outputs
+
+    def add_sink(self, sink: Callable[[Dict[str, Any]], None]) -> None:
+        """Call `sink(event)` for every observation; `event` has ts, type, metric, value and labels."""
+        self._sinks.append(sink)
+
+    def _emit(self, kind: str, name: str, value: float, labels: Dict[str, Any]) -> None:
+        if not self._sinks:
+            return
+        event = {"ts": time.time(), "type": kind, "metric": name, "value": value,
+                 "labels": {k: str(v) for k, v in labels.items()}}
+        for sink in self._sinks:
+            try:
+                sink(event)
+            except Exception as e:  # a broken sink must not break the pipeline
+                print(f"Metrics sink failed: {e}")
+
+    def enable_opentelemetry(self, tracer_name: str = "news_to_map") -> None:
+        """Also open an OpenTelemetry span for every `timer` block (needs `opentelemetry-api`)."""
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetry spans need the optional dependency: pip install opentelemetry-api") from e
+        self._tracer = trace.get_tracer(tracer_name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and histogram count/sum as plain dicts, e.g. for a JSON report."""
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for name, series in self._counters.items():
+                out[name] = {",".join(f"{k}={v}" for k, v in key): value for key, value in series.items()}
+            for name, series in self._histograms.items():
+                out[name] = {",".join(f"{k}={v}" for k, v in key): {"count": int(h[-1]), "sum": h[-2]}
+                             for key, h in series.items()}
+            return out
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        def _fmt(key: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = METRIC_PREFIX + name
+                lines.append(f"# TYPE {full} counter")
+                for key, value in series.items():
+                    lines.append(f"{full}{_fmt(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                full = METRIC_PREFIX + name
+                lines.append(f"# TYPE {full} histogram")
+                for key, h in series.items():
+                    for bound, count in zip(self.buckets, h):
+                        lines.append(f"{full}_bucket{_fmt(key, (('le', f'{bound:g}'),))} {count:g}")
+                    lines.append(f"{full}_bucket{_fmt(key, (('le', '+Inf'),))} {h[-1]:g}")
+                    lines.append(f"{full}_sum{_fmt(key)} {h[-2]:g}")
+                    lines.append(f"{full}_count{_fmt(key)} {h[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def json_log_sink(stream: IO[str] = sys.stderr) -> Callable[[Dict[str, Any]], None]:
+    """Sink writing each observation as one JSON line to `stream`."""
+    lock = threading.Lock()
+
+    def _sink(event: Dict[str, Any]) -> None:
+        line = json.dumps(event, ensure_ascii=False)
+        with lock:
+            stream.write(line + "\n")
+            stream.flush()
+    return _sink
+
+
+def serve_prometheus(metrics: Optional[Metrics] = None, port: int = 9464, host: str = "127.0.0.1"):
+    """Expose `/metrics` for Prometheus on a background thread; returns the server (call `.shutdown()` to stop)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = (metrics or get_metrics()).to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """The process-wide registry the pipeline records into."""
+    return _metrics
+
+
+def set_metrics(metrics: Metrics) -> None:
+    """Replace the process-wide registry (e.g. a fresh one per benchmark run)."""
+    global _metrics
+    _metrics = metrics
@@ -0,0 +1,290 @@
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+from gazetteer import LocalGazetteer, fold_name, CITY, ADM2, ADM1, COUNTRY
+from nlp_loc_extractor import LOCATION_KEYS, ExtractionFailed, validate_locations
+from prefilter import CAPITALIZED_SPAN, NON_PLACE_WORDS, ORG_WORDS
+from instrumentation import get_metrics
+from retry_policy import RetryPolicy
+
+# a capitalized span containing one of these words is treated as a landmark
+LANDMARK_WORDS = {
+    "River", "Lake", "Canyon", "Park", "Mount", "Mountain", "Mountains", "Valley", "Island", "Bay",
+    "Bridge", "Cathedral", "Church", "Ground", "Stadium", "Airport", "Tower", "Square", "Beach",
+    "Falls", "Forest", "Desert", "Glacier", "Peak", "Wharf", "Palace", "Museum", "Castle", "Dam",
+}
+
+_COUNTY_SUFFIX = re.compile(r"\s+(County|Parish|Borough)$")
+_SENTENCE = re.compile(r"[^.!?\n]*[.!?]?")
+
+
+def local_extractor_id(gazetteer: LocalGazetteer, nlp: Any = None, min_population: int = 1000) -> str:
+    """
+    Identity of a local extractor configuration, for result cache keys: the
+    gazetteer's fingerprint, the NER model's name and version (or "matcher")
+    and the population threshold. Changing any of them changes the output.
+    """
+    if nlp is None:
+        ner = "matcher"
+    else:
+        meta = getattr(nlp, "meta", None) or {}
+        ner = f"{meta.get('lang', '')}_{meta.get('name', type(nlp).__name__)}-{meta.get('version', '')}"
+    return f"local|gaz-{gazetteer.fingerprint}|{ner}|pop{min_population}"
+
+
+def _find_spans(text: str, gazetteer: LocalGazetteer, nlp: Any = None,
+                min_population: int = 1000) -> List[Tuple[str, bool]]:
+    """
+    Return (span, is_landmark) pairs in order of first appearance.
+
+    With a spaCy pipeline, GPE/LOC/FAC entities are used and FAC/LOC entities
+    unknown to the gazetteer become landmarks. Otherwise capitalized spans are
+    matched against the gazetteer (longest match first), and spans containing a
+    `LANDMARK_WORDS` word ("Juniper Lake") become landmarks.
+    """
+    spans: List[Tuple[str, bool]] = []
+    if nlp is not None:
+        for ent in nlp(text).ents:
+            if ent.label_ in ("GPE", "LOC", "FAC"):
+                known = bool(_resolve_span_candidates(ent.text, gazetteer, min_population))
+                spans.append((ent.text, not known and ent.label_ != "GPE"))
+        return spans
+
+    for m in CAPITALIZED_SPAN.finditer(text):
+        words = m.group().split()
+        while words and words[0] in NON_PLACE_WORDS:
+            words = words[1:]
+        if not words or ORG_WORDS.intersection(words):
+            continue
+        if LANDMARK_WORDS.intersection(words) and len(words) > 1:
+            spans.append((" ".join(words), True))
+            continue
+        start = 0
+        while start < len(words):
+            for size in range(len(words) - start, 0, -1):
+                span = " ".join(words[start:start + size])
+                if span not in NON_PLACE_WORDS and _resolve_span_candidates(span, gazetteer, min_population):
+                    spans.append((span, False))
+                    start += size
+                    break
+            else:
+                start += 1
+    order = {s: text.find(s) for s, _ in spans}
+    return sorted(spans, key=lambda s: order[s[0]])
+
+
+def _resolve_span_candidates(span: str, gazetteer: LocalGazetteer, min_population: int = 1000) -> List[Tuple[int, Any]]:
+    """Candidate (kind, key) pairs for a span: country code, admin1 key or feature id."""
+    folded = fold_name(span)
+    if folded in gazetteer.country_lookup:
+        return [(COUNTRY, gazetteer.country_lookup[folded])]
+    if folded in gazetteer.admin1_lookup:
+        return [(ADM1, k) for k in sorted(gazetteer.admin1_lookup[folded])]
+    fids = gazetteer.index.get(folded, ())
+    cities = [(CITY, f) for f in fids if gazetteer.kind[f] == CITY and gazetteer.population[f] >= min_population]
+    if cities:
+        return cities
+    return [(ADM2, f) for f in fids if gazetteer.kind[f] == ADM2]
+
+
+def _first_sentence(text: str, span: str, max_len: int = 160) -> str:
+    pos = text.find(span)
+    for m in _SENTENCE.finditer(text):
+        if m.start() <= pos < m.end() or (pos == -1 and m.group().strip()):
+            sentence = m.group().strip()
+            return sentence if len(sentence) <= max_len else sentence[:max_len - 1].rstrip() + "…"
+    return "None"
+
+
+def _summarize_with_llm(text: str, rows: List[Dict[str, Any]], client: Any, model_name: str,
+                        max_chars: int = 8000) -> List[Dict[str, Any]]:
+    """One short LLM call returning a summary per place, and a choice for ambiguous places."""
+    places = []
+    for i, r in enumerate(rows):
+        entry = {"id": i, "place": r["label"]}
+        if r.get("options"):
+            entry["options"] = [o["label"] for o in r["options"]]
+        places.append(entry)
+    prompt = (
+        "For each place below, write a very concise summary of why it is mentioned in the article. "
+        "When a place has \"options\", also return the 0-based index of the option the article refers to "
+        "as \"choice\". Return only a JSON list of objects {\"id\", \"summary\", \"choice\"}.\n\n"
+        f"Places: {json.dumps(places, ensure_ascii=False)}\n\nArticle text:\n{text[:max_chars]}"
+    )
+    with get_metrics().timer("llm_request_seconds", model=model_name):
+        response = client.models.generate_content(model=model_name, contents=prompt)
+    match = re.search(r"\[.*\]", response.text or "", re.DOTALL)
+    if not match:
+        raise ValueError("No JSON list in the summary response")
+    return json.loads(match.group())
+
+
+def extract_locations_local(
+    text: str,
+    gazetteer: LocalGazetteer,
+    client: Any = None,
+    model_name: str = "gemini-2.5-flash",
+    nlp: Any = None,
+    min_population: int = 1000,
+    test_mode: bool = False,
+    retry_policy: RetryPolicy = None,
+) -> Dict[str, List[str]]:
+    """
+    Extract locations with local span detection and a gazetteer admin hierarchy,
+    calling the LLM only for the short summaries and ambiguous place names.
+
+    Place spans come from a spaCy NER pipeline if `nlp` is given (e.g.
+    `spacy.load("en_core_web_sm")`, optional dependency), else from a gazetteer
+    matcher over capitalized spans. Each span is resolved to city -> county ->
+    state -> country from the gazetteer; a city name matching several places
+    is disambiguated by the countries/states mentioned in the article, and only
+    left to the LLM when that context does not settle it. Spans unknown to the
+    gazetteer that look like landmarks ("Juniper Lake") are attached to the
+    state and country most of the article's resolved places are in, so "the
+    Eiffel Tower" in an article about Paris gets Île-de-France, France.
+
+    Parameters
+    ----------
+    text : str
+        The article to analyze.
+    gazetteer : LocalGazetteer
+        Gazetteer providing names and the admin hierarchy.
+    client : Any, optional
+        Gemini client for summaries/disambiguation. Without it, each summary is
+        the sentence where the place first appears and ambiguous names take the
+        most populated candidate. By default None.
+    model_name : str, optional
+        Model for the summary call, by default "gemini-2.5-flash".
+    nlp : Any, optional
+        spaCy pipeline used for NER, by default None.
+    min_population : int, optional
+        Smallest populated place considered a match, by default 1000.
+    test_mode : bool, optional
+        If True, prints debugging information, by default False.
+    retry_policy : RetryPolicy, optional
+        Backoff and deadline of the summary call, by default a fresh `RetryPolicy()`.
+
+    Returns
+    -------
+    Dict[str, List[str]]
+        Same six-key parallel-list dict as `extract_locations_with_gemini`
+        ({} if no location was found), so `geocode_nominatim` works unchanged.
+
+    Raises
+    ------
+    ExtractionFailed
+        If the summary call still fails after its retries, rather than
+        returning a degraded result that would be cached as a complete one.
+    """
+    g = gazetteer
+    spans = _find_spans(text, g, nlp, min_population)
+    if test_mode:
+        print(f"Local spans: {spans}")
+
+    resolved = [(span, lm, [] if lm else _resolve_span_candidates(span, g, min_population)) for span, lm in spans]
+    context_cc = {}
+    context_a1 = {}
+    for _, _, cands in resolved:
+        if len(cands) == 1 and cands[0][0] == COUNTRY:
+            context_cc[cands[0][1]] = context_cc.get(cands[0][1], 0) + 1
+        if cands and all(c[0] == ADM1 for c in cands) and len({c[1][0] for c in cands}) == 1:
+            key = cands[0][1]
+            context_a1[key] = context_a1.get(key, 0) + 1
+
+    def _names(cc, a1=None, a2=None):
+        county = g.admin2_names.get((cc, a1, a2), "None") if a2 else "None"
+        return {
+            "provinces_counties": _COUNTY_SUFFIX.sub("", county),
+            "states": g.admin1_names.get((cc, a1), "None") if a1 else "None",
+            "countries": g.country_names.get(cc, cc),
+        }
+
+    def _row_for(kind, key):
+        if kind == COUNTRY:
+            return {"cities": "None", "provinces_counties": "None", "states": "None",
+                    "countries": g.country_names.get(key, key), "landmarks": "None"}
+        if kind == ADM1:
+            return {"cities": "None", "landmarks": "None", **_names(key[0], key[1])}
+        f = key
+        row = {"landmarks": "None", **_names(g.country_code[f], g.admin1_code[f], g.admin2_code[f])}
+        row["cities"] = g.names[f] if kind == CITY else "None"
+        if kind == ADM2:
+            row["provinces_counties"] = _COUNTY_SUFFIX.sub("", g.names[f])
+        return row
+
+    def _admin(c):
+        # (country code, admin1 key or None) of a candidate
+        kind, key = c
+        cc = key if kind == COUNTRY else key[0] if kind == ADM1 else g.country_code[key]
+        a1 = key if kind == ADM1 else (g.country_code[key], g.admin1_code[key]) if kind in (CITY, ADM2) else None
+        return cc, a1
+
+    def _score(c):
+        cc, a1 = _admin(c)
+        pop = g.population[c[1]] if c[0] in (CITY, ADM2) else 0
+        return (a1 in context_a1, cc in context_cc, pop)
+
+    ranked_of = {span: sorted(cands, key=_score, reverse=True) for span, _, cands in resolved if cands}
+
+    # landmarks take the state and country most of the resolved mentions (cities included) are in
+    cc_votes, a1_votes = {}, {}
+    for span, _, cands in resolved:
+        if cands:
+            cc, a1 = _admin(ranked_of[span][0])
+            cc_votes[cc] = cc_votes.get(cc, 0) + 1
+            if a1 in g.admin1_names:
+                a1_votes[a1] = a1_votes.get(a1, 0) + 1
+    top_cc = max(cc_votes, key=cc_votes.get) if cc_votes else None
+    top_state = max((a1 for a1 in a1_votes if a1[0] == top_cc), key=a1_votes.get, default=None)
+
+    rows, seen = [], set()
+    for span, is_landmark, cands in resolved:
+        if is_landmark:
+            row = {"cities": "None", "provinces_counties": "None", "landmarks": span,
+                   "states": g.admin1_names.get(top_state, "None") if top_state else "None",
+                   "countries": g.country_names.get(top_cc, "None") if top_cc else "None"}
+            options = []
+        else:
+            if not cands:
+                continue
+            ranked = ranked_of[span]
+            row = _row_for(*ranked[0])
+            best, runner_up = _score(ranked[0]), _score(ranked[1]) if len(ranked) > 1 else None
+            ambiguous = (runner_up is not None and best[:2] == runner_up[:2]
+                         and runner_up[2] * 5 > best[2])
+            options = [dict(_row_for(*c)) for c in ranked[:3]] if ambiguous else []
+            for o in options:
+                o["label"] = ", ".join(v for k, v in o.items() if v != "None")
+        key = tuple(row[k] for k in LOCATION_KEYS if k != "summary")
+        if key in seen:
+            continue
+        seen.add(key)
+        rows.append({**row, "span": span, "options": options,
+                     "label": ", ".join(v for k, v in row.items() if v != "None")})
+
+    if not rows:
+        return {}
+
+    llm_out = {}
+    if client is not None:
+        try:
+            answers = (retry_policy or RetryPolicy()).run(_summarize_with_llm, text, rows, client, model_name)
+        except Exception as e:
+            print(f"Summary call failed: {e}")
+            raise ExtractionFailed(str(e)) from e
+        llm_out = {int(o["id"]): o for o in answers if isinstance(o, dict) and "id" in o}
+
+    out = {k: [] for k in LOCATION_KEYS}
+    for i, r in enumerate(rows):
+        answer = llm_out.get(i, {})
+        choice = answer.get("choice")
+        if r["options"] and isinstance(choice, int) and 0 <= choice < len(r["options"]):
+            r = {**r, **{k: v for k, v in r["options"][choice].items() if k != "label"}}
+        for k in LOCATION_KEYS:
+            if k == "summary":
+                out[k].append(str(answer.get("summary") or _first_sentence(text, r["span"])))
+            else:
+                out[k].append(r[k])
+    validated, errors = validate_locations(out)
+    return validated if not errors else {}
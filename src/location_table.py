@@ -0,0 +1,285 @@
+from array import array
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# column kinds; every other column holds dictionary-encoded strings
+FLOAT_COLUMNS = {"lat", "lon", "importance"}
+INT_COLUMNS = {"osm_id", "article_index"}
+# candidates for the displayed name of a location, in order of preference (after the display name)
+MAP_NAME_SOURCES = ("landmarks", "cities", "provinces_counties", "states", "countries")
+
+
+def _missing(value: Any) -> bool:
+    return value is None or value == "None"
+
+
+class StringColumn:
+    """
+    Dictionary-encoded strings: one int32 code per row into a list of distinct
+    values, each stored once however many rows repeat it. None is code -1.
+    """
+
+    def __init__(self, values: Iterable[Hashable] = ()):
+        self.codes = array("i")
+        self.values: List[Hashable] = []
+        self._index: Dict[Hashable, int] = {}
+        self.extend(values)
+
+    def extend(self, values: Iterable[Hashable]) -> None:
+        index, distinct, codes = self._index, self.values, self.codes
+        for v in values:
+            if v is None:
+                codes.append(-1)
+                continue
+            code = index.get(v)
+            if code is None:
+                code = index[v] = len(distinct)
+                distinct.append(v)
+            codes.append(code)
+
+    def extend_column(self, other: "StringColumn") -> None:
+        # re-map the other dictionary once instead of re-interning every row
+        remap = np.array([self._intern(v) for v in other.values] + [-1], dtype=np.int32)
+        self.codes.extend(remap[np.frombuffer(other.codes, dtype=np.int32)].tolist())
+
+    def _intern(self, v: Hashable) -> int:
+        code = self._index.get(v)
+        if code is None:
+            code = self._index[v] = len(self.values)
+            self.values.append(v)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def to_numpy(self) -> np.ndarray:
+        """Object array of the values, None where missing."""
+        lookup = np.empty(len(self.values) + 1, dtype=object)
+        lookup[:-1] = self.values
+        return lookup[np.frombuffer(self.codes, dtype=np.int32)]  # code -1 picks the trailing None
+
+    def mask(self, keep) -> np.ndarray:
+        """Boolean array: True where `keep(value)` holds (evaluated once per distinct value)."""
+        lookup = np.array([bool(keep(v)) for v in self.values] + [bool(keep(None))], dtype=bool)
+        return lookup[np.frombuffer(self.codes, dtype=np.int32)]
+
+    def to_pandas(self, categorical: bool = False):
+        if categorical:
+            return pd.Categorical.from_codes(np.frombuffer(self.codes, dtype=np.int32), categories=self.values)
+        return self.to_numpy()
+
+    def to_arrow(self):
+        import pyarrow as pa
+        codes = np.frombuffer(self.codes, dtype=np.int32)
+        return pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0),
+                                              pa.array([str(v) for v in self.values], type=pa.string()))
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes) + sum(len(str(v)) + 49 for v in self.values)
+
+
+class FloatColumn:
+    """float64 values, NaN where missing."""
+
+    def __init__(self, values: Iterable[Optional[float]] = ()):
+        self.data = array("d")
+        self.extend(values)
+
+    def extend(self, values: Iterable[Optional[float]]) -> None:
+        nan = float("nan")
+        self.data.extend(nan if v is None else float(v) for v in values)
+
+    def extend_column(self, other: "FloatColumn") -> None:
+        self.data.extend(other.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def to_numpy(self) -> np.ndarray:
+        return np.frombuffer(self.data, dtype=np.float64)
+
+    def to_pandas(self, categorical: bool = False):
+        values = self.to_numpy().copy()
+        if len(values) and np.isnan(values).all():
+            return np.full(len(values), None, dtype=object)  # as pandas infers a column of only None
+        return values
+
+    def to_arrow(self):
+        import pyarrow as pa
+        values = self.to_numpy()
+        return pa.array(values, mask=np.isnan(values))
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.itemsize * len(self.data)
+
+
+class IntColumn:
+    """int64 values (ids, indices), -1 where missing."""
+
+    def __init__(self, values: Iterable[Optional[int]] = ()):
+        self.data = array("q")
+        self.extend(values)
+
+    def extend(self, values: Iterable[Optional[int]]) -> None:
+        self.data.extend(-1 if v is None else int(v) for v in values)
+
+    def extend_column(self, other: "IntColumn") -> None:
+        self.data.extend(other.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def to_numpy(self) -> np.ndarray:
+        return np.frombuffer(self.data, dtype=np.int64)
+
+    def to_pandas(self, categorical: bool = False):
+        values = self.to_numpy()
+        missing = values < 0
+        if not missing.any():
+            return values.copy()
+        if missing.all():
+            return np.full(len(values), None, dtype=object)
+        return np.where(missing, np.nan, values.astype(np.float64))  # ints with None, as pandas infers them
+
+    def to_arrow(self):
+        import pyarrow as pa
+        values = self.to_numpy()
+        return pa.array(values, mask=values < 0)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.itemsize * len(self.data)
+
+
+def _new_column(name: str, values: Iterable[Any] = ()):
+    if name in FLOAT_COLUMNS:
+        return FloatColumn(values)
+    if name in INT_COLUMNS:
+        return IntColumn(values)
+    return StringColumn(values)
+
+
+class LocationTable:
+    """
+    Columnar geocoding results: coordinates in float arrays, ids in int arrays
+    and every text column dictionary-encoded, so a place, country or summary
+    repeated across many rows is stored once. A row costs a few dozen bytes
+    instead of a dict plus a DataFrame row of Python objects, which makes
+    aggregating a whole corpus of mentions practical.
+
+    Build it column by column (`add_column`), append other tables (`extend`),
+    and export with `to_dataframe`, `to_arrow` or `write_parquet` (the last two
+    need the optional dependency `pyarrow`).
+
+    Parameters
+    ----------
+    columns : Dict[str, Sequence], optional
+        Initial columns, all of the same length.
+    """
+
+    def __init__(self, columns: Optional[Dict[str, Sequence[Any]]] = None):
+        self.columns: Dict[str, Any] = {}
+        self._n = 0
+        for name, values in (columns or {}).items():
+            self.add_column(name, values)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def add_column(self, name: str, values: Iterable[Any]) -> None:
+        """Add (or replace) a column; its length must match the table's."""
+        column = _new_column(name, values)
+        if self.columns and len(column) != self._n:
+            raise ValueError(f"Column {name!r} has {len(column)} rows, the table has {self._n}.")
+        self.columns[name] = column
+        self._n = len(column)
+
+    def add_constant(self, name: str, value: Any) -> None:
+        """Add a column repeating `value` on every row (e.g. the source article)."""
+        self.add_column(name, [value] * self._n)
+
+    def add_map_name(self) -> None:
+        """
+        Add "map_name", the label shown on the map: the first non-missing of the
+        display name's first part, landmark, city, county, state and country,
+        else "None". Computed in one vectorized pass over the encoded columns.
+        """
+        display = self.columns["display_name"]
+        first_part = StringColumn()
+        first_part.values = [v.split(',')[0] for v in display.values]
+        first_part.codes = display.codes
+        sources = [first_part] + [self.columns[k] for k in MAP_NAME_SOURCES]
+        names = np.full(self._n, "None", dtype=object)
+        for col in reversed(sources):
+            names = np.where(col.mask(lambda v: not _missing(v)), col.to_numpy(), names)
+        self.add_column("map_name", names.tolist())
+
+    def extend(self, other: "LocationTable") -> None:
+        """Append the rows of `other`, which must have the same columns."""
+        if not self.columns:
+            for name, column in other.columns.items():
+                self.columns[name] = _new_column(name)
+        if list(other.columns) != list(self.columns):
+            raise ValueError(f"Cannot append a table with columns {list(other.columns)} to {list(self.columns)}.")
+        for name, column in other.columns.items():
+            self.columns[name].extend_column(column)
+        self._n += len(other)
+
+    @classmethod
+    def concat(cls, tables: Iterable["LocationTable"]) -> "LocationTable":
+        out = cls()
+        for table in tables:
+            out.extend(table)
+        return out
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "LocationTable":
+        """Encode a `geocode_nominatim` DataFrame (or any frame of such columns)."""
+        return cls({name: [None if pd.isna(v) else v for v in df[name].tolist()] for name in df.columns})
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns."""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def to_dataframe(self, categorical: bool = False) -> pd.DataFrame:
+        """
+        The table as a DataFrame. By default text columns are plain object
+        columns, exactly as `geocode_nominatim` has always returned them; with
+        `categorical=True` they stay dictionary-encoded as pandas categoricals.
+        """
+        if not self.columns:
+            return pd.DataFrame()
+        return pd.DataFrame({name: column.to_pandas(categorical) for name, column in self.columns.items()})
+
+    def to_arrow(self):
+        """The table as a `pyarrow.Table`, text columns dictionary-encoded (needs `pyarrow`)."""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("Arrow/Parquet export needs the optional dependency: pip install pyarrow") from e
+        return pa.table({name: column.to_arrow() for name, column in self.columns.items()})
+
+    def write_parquet(self, path: str) -> None:
+        """Write the table to a Parquet file (needs `pyarrow`)."""
+        table = self.to_arrow()
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+
+
+if __name__ == "__main__":
+    table = LocationTable({
+        "cities": ["Paris", "Lyon", "None"], "provinces_counties": ["Paris", "Rhône", "None"],
+        "states": ["Île-de-France", "Auvergne-Rhône-Alpes", "None"], "countries": ["France"] * 3,
+        "landmarks": ["Eiffel Tower", "None", "Mont Blanc"], "summary": ["Visit", "Festival", "Climb"],
+        "display_name": ["Tour Eiffel, Paris, France", "Lyon, Métropole de Lyon, France", None],
+        "lat": [48.858, 45.758, None], "lon": [2.294, 4.835, None],
+        "osm_id": [5013364, 120965, None],
+    })
+    table.add_map_name()
+    print(table.to_dataframe())
+    print(f"{len(table)} rows, ~{table.nbytes} bytes")
@@ -4,27 +4,38 @@ Extracts real-world locations from news articles via URL or direct text input.
 """
 
 import os
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, Union
 import argparse
+import json
+import queue
 import sys
-from google import genai
-
-import requests_cache
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
+import threading
 
 from dotenv import load_dotenv
-load_dotenv()  #load environment variables from .env file
 
-from article_text_extractor import extract_article_text as ext_url_text
-from nlp_loc_extractor import extract_locations_with_gemini as ext_locations
-from geocode_loc_finder import geocode_nominatim as ext_coordinates
-from map_viz import create_styled_map, save_open_map_in_browser
+# google.genai (via the client), geopy/requests_cache/pandas/tqdm (geocode_loc_finder),
+# folium (map_viz) and trafilatura are imported on first use, so `--help`, cached
+# runs and the Streamlit app do not pay for them at startup (see benchmarks/import_time_check.py)
+from article_text_extractor import extract_article_text as ext_url_text, fetch_article, ArticleFetcher, new_parse_pool
+from nlp_loc_extractor import extract_locations_chunked as ext_locations, PROMPT_VERSION, PromptPrefixCache
+from local_loc_extractor import extract_locations_local, local_extractor_id
+from cache_store import GeocodeStore, LRUMemo, LLMResultCache, MISS
+from gazetteer import LocalGazetteer
+from rate_policy import RatePolicy, RateLimitedGeocoder, PUBLIC_NOMINATIM_DOMAIN
+from retry_policy import RetryPolicy
+from prefilter import prefilter_article
+from model_tiers import ModelTierPolicy
+from instrumentation import get_metrics, json_log_sink
 
 class NoLocationsFound(Exception):
     pass
 class NoArticleExtracted(Exception):
     pass
+class InvalidInput(ValueError):
+    pass
+
+# end-of-stream marker passed between pipeline stages
+_DONE = object()
 
 
 class ArticleLocationExtractor:
@@ -41,89 +52,294 @@ class ArticleLocationExtractor:
             ``GEMINI_API_KEY`` environment variable.
         model_name: Gemini model identifier to call (e.g., ``"gemini-2.5-pro"``).
         user_agent: User-agent string passed to Nominatim.
+        geocode_store_path: SQLite file of the persistent place store used by
+            geocoding. ``None`` disables the store.
+        gazetteer: Optional offline ``LocalGazetteer`` tried before Nominatim for
+            cities/counties/states/countries. Landmarks and misses still go to Nominatim.
+        nominatim_domain: Host (and optional port) of the Nominatim server, e.g.
+            ``"localhost:8080"`` for a self-hosted instance.
+        nominatim_scheme: ``"https"`` or ``"http"``.
+        rate_policy: Request budget for the endpoint. Defaults to
+            ``RatePolicy.for_endpoint(nominatim_domain)``: 1 request/second with no
+            parallelism for the public server, a generous budget otherwise.
+        landmark_mode: ``"sequential"`` or ``"speculative"`` landmark query cascade
+            (see ``geocode_nominatim``). Defaults to speculative when the rate
+            policy allows concurrent requests, sequential otherwise.
+        chunk_tokens: Approximate token budget of article text per Gemini call.
+            Longer articles are split into overlapping chunks and their results merged.
+        overlap_tokens: Approximate overlap between consecutive chunks, less than
+            half of ``chunk_tokens``. ``None`` (default) scales it with
+            ``chunk_tokens`` (see ``extract_locations_chunked``).
+        max_llm_concurrency: Maximum number of chunks of one article sent to Gemini at once.
+        llm_cache_path: SQLite file caching parsed extractions by normalized-text
+            hash, model and prompt version. ``None`` disables the cache.
+        retry_policy: Backoff/deadline policy for Gemini calls. Defaults to ``RetryPolicy()``.
+        fetcher: ``ArticleFetcher`` used for URLs (pooled session, per-host limits,
+            conditional GETs, ``article_cache.sqlite``). Defaults to a new one.
+        prefilter: Run the cheap local ``prefilter_article`` check (HTTP status,
+            bot-wall/paywall patterns, place-name scan) before calling Gemini, so
+            blocked or location-free articles are rejected without an API call.
+        extractor_backend: ``"gemini"`` (the whole article goes to ``model_name``)
+            or ``"local"``: place spans come from a local NER model/gazetteer
+            matcher, the admin hierarchy from ``gazetteer``, and Gemini
+            (``summary_model``) is only asked for summaries and ambiguous names.
+            ``"local"`` requires a ``gazetteer``.
+        summary_model: Model of the short summary call of the local backend.
+        ner_model: Optional spaCy pipeline (e.g. ``spacy.load("en_core_web_sm")``)
+            used by the local backend instead of the gazetteer span matcher.
+        model_tiers: Tiered extraction for the ``"gemini"`` backend: a list of
+            models from cheapest to most capable (e.g. ``["gemini-2.5-flash",
+            "gemini-2.5-pro"]``) or a ``ModelTierPolicy``. Each article goes to
+            the first model and is only re-extracted by the next one when the
+            output fails validation. ``None`` (default) always uses ``model_name``.
+        prompt_cache: Hold the static instructions and few-shot examples of the
+            extraction prompt in a Gemini context cache (``PromptPrefixCache``)
+            instead of sending them with every call. Off by default: the current
+            prefix is below the models' minimum cacheable size, and it falls back
+            to a plain system instruction wherever explicit caching is not available.
 
     Attributes:
         api_key (str): The effective Gemini API key in use.
-        client (genai.Client): Gemini client initialized with ``api_key``.
+        client (genai.Client): Gemini client for ``api_key``, created on first use.
         model_name (str): The Gemini model to call for extraction.
         geocode (Callable): Rate-limited Nominatim geocode function
-            (wrapped with ``RateLimiter``) that honors caching via ``requests_cache``.
+            (wrapped with ``RateLimitedGeocoder``) whose HTTP session caches via ``requests_cache``;
+            the geopy geocoder behind it is built on the first query.
+        rate_policy (RatePolicy): The effective endpoint budget; its
+            ``max_in_flight`` sets the number of geocoding threads.
+        geocode_store (GeocodeStore | None): Persistent place store consulted
+            before any Nominatim call; hits skip the rate limiter entirely.
+        llm_cache (LLMResultCache | None): Extraction cache; ``llm_cache.stats()``
+            reports hits and misses.
+        retry_policy (RetryPolicy): Shared by every Gemini call of this instance;
+            ``retry_policy.summary()`` reports attempts and backoff time.
+        model_tiers (ModelTierPolicy | None): Tier routing; ``model_tiers.summary()``
+            reports per-tier latency, tokens, cost and escalation rate.
+        geocode_memo (LRUMemo): In-process results shared by every article this
+            instance geocodes, so a place mentioned across a corpus is resolved once.
 
     Raises:
         ValueError: If no API key is provided and ``GEMINI_API_KEY`` is unset.
 
     Notes:
-        - Nominatim calls are rate-limited (min 1s between calls) and exceptions
-          are swallowed per ``RateLimiter`` configuration.
+        - Nominatim calls are rate-limited per ``rate_policy`` (1 request/second on
+          the public endpoint). Requests that still fail after retries leave their
+          rows unresolved without being remembered as misses, so they are retried
+          by the next article or run.
         - Geocoding responses are cached for 7 days using ``requests_cache`` under
-          the ``"geocode_cache"`` namespace.
+          the ``"geocode_cache"`` namespace. Only the geocoder's session is cached;
+          article pages go through ``fetcher`` and its own ``article_cache``.
         - See ``process_article`` for the main orchestration entrypoint. It can
           accept a URL or raw text, handles common fetch/parse failures (e.g.
           short ``403 Forbidden`` pages), and returns a bundle suitable for Streamlit.
     """
         
-    def __init__(self, api_key: str, model_name:str = "gemini-2.5-pro", user_agent = "art_loc_extr_finder"):
+    def __init__(self, api_key: str, model_name:str = "gemini-2.5-pro", user_agent = "art_loc_extr_finder",
+                 geocode_store_path: str = "geocode_store.sqlite", gazetteer: LocalGazetteer = None,
+                 nominatim_domain: str = PUBLIC_NOMINATIM_DOMAIN, nominatim_scheme: str = "https",
+                 rate_policy: RatePolicy = None, landmark_mode: str = None,
+                 chunk_tokens: int = 2500, overlap_tokens: int = None, max_llm_concurrency: int = 4,
+                 llm_cache_path: str = "llm_cache.sqlite", retry_policy: RetryPolicy = None,
+                 fetcher: ArticleFetcher = None, prefilter: bool = True,
+                 extractor_backend: str = "gemini", summary_model: str = "gemini-2.5-flash", ner_model = None,
+                 model_tiers: Union[List[str], ModelTierPolicy] = None, prompt_cache: bool = False):
         """Initialize with Gemini API key."""
         if api_key is None:
             print(f"LLM API key not directly provided, fetching it from environment")
+            load_dotenv()  # load environment variables from .env file
             self.api_key = os.environ.get("GEMINI_API_KEY")
         else:
             self.api_key = api_key
         if not self.api_key:
             raise ValueError("Gemini API key not provided or set in GEMINI_API_KEY environment variable.")
-        self.client = genai.Client(api_key=self.api_key)
+        self._client = None
+        self._lazy_lock = threading.Lock()
         self.model_name = model_name
+        if overlap_tokens is not None and not 0 <= 2 * overlap_tokens < chunk_tokens:
+            raise ValueError(f"overlap_tokens must be between 0 and half of chunk_tokens, got {overlap_tokens}.")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.max_llm_concurrency = max_llm_concurrency
+        self.llm_cache = LLMResultCache(llm_cache_path) if llm_cache_path else None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.fetcher = fetcher or ArticleFetcher()
+        self.prefilter = prefilter
+        if extractor_backend not in ("gemini", "local"):
+            raise ValueError(f"Unknown extractor backend {extractor_backend!r}, expected 'gemini' or 'local'.")
+        if extractor_backend == "local" and gazetteer is None:
+            raise ValueError("The local extractor backend needs a gazetteer.")
+        self.extractor_backend = extractor_backend
+        self.summary_model = summary_model
+        self.ner_model = ner_model
+        self._local_variant = None
+        if model_tiers is not None and not isinstance(model_tiers, ModelTierPolicy):
+            model_tiers = ModelTierPolicy(model_tiers, gazetteer=gazetteer)
+        self.model_tiers = model_tiers
+        self.prefix_cache = PromptPrefixCache() if prompt_cache else None
 
         """Initialize geocode with caching"""
-        requests_cache.install_cache("geocode_cache", expire_after=7*24*3600)
-        geolocator = Nominatim(user_agent=user_agent, timeout=10)
-        self.geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.0, swallow_exceptions=True)
+        self._geolocator = None
+        self._geolocator_args = dict(user_agent=user_agent, domain=nominatim_domain, scheme=nominatim_scheme)
+        self.rate_policy = rate_policy or RatePolicy.for_endpoint(nominatim_domain)
+        self.geocode = RateLimitedGeocoder(self._nominatim_geocode, self.rate_policy, swallow_exceptions=False)
+        if landmark_mode is None:
+            landmark_mode = "speculative" if self.rate_policy.max_in_flight > 1 else "sequential"
+        self.landmark_mode = landmark_mode
+        self.geocode_store = GeocodeStore(geocode_store_path) if geocode_store_path else None
+        # dedupes geocode queries across articles processed by this instance
+        self.geocode_memo = LRUMemo(max_entries=100_000)
+        self.gazetteer = gazetteer
+
+
+    @property
+    def client(self):
+        """Gemini client, created on first use (importing ``google.genai`` alone takes most of a second)."""
+        if self._client is None:
+            with self._lazy_lock:
+                if self._client is None:
+                    from google import genai
+                    self._client = genai.Client(api_key=self.api_key)
+        return self._client
 
+    @client.setter
+    def client(self, client):
+        self._client = client
 
-    def url_text_extractor(self, url):
-        return ext_url_text(url)
+    def _nominatim_geocode(self, *args, **kwargs):
+        # the geopy geocoder and its cached HTTP session are built on the first query
+        if self._geolocator is None:
+            with self._lazy_lock:
+                if self._geolocator is None:
+                    from geopy.geocoders import Nominatim
+                    from geocode_loc_finder import CachedRequestsAdapter
+                    self._geolocator = Nominatim(timeout=10, adapter_factory=CachedRequestsAdapter,
+                                                 **self._geolocator_args)
+        return self._geolocator.geocode(*args, **kwargs)
+
+    def url_text_extractor(self, url, parse_pool = None):
+        return ext_url_text(url, fetcher = self.fetcher, parse_pool = parse_pool)
     
+    @property
+    def _chunk_variant(self):
+        # cache variant of the chunking settings; the default overlap keeps the key it always had
+        if self.overlap_tokens is None:
+            return f"chunk{self.chunk_tokens}"
+        return f"chunk{self.chunk_tokens}-overlap{self.overlap_tokens}"
+
     def location_extractor(self, text):
-        return ext_locations(text, self.client, self.model_name, test_mode = False)
+        if self.extractor_backend == "local":
+            # results depend on the gazetteer build and NER model as much as on the summary model
+            if self._local_variant is None:
+                self._local_variant = local_extractor_id(self.gazetteer, self.ner_model)
+            model_name, variant = self.summary_model, self._local_variant
+        elif self.model_tiers is not None:
+            model_name, variant = self.model_tiers.cache_name, self._chunk_variant
+        else:
+            model_name, variant = self.model_name, self._chunk_variant
+        if self.llm_cache is not None:
+            cached = self.llm_cache.get_result(text, model_name, PROMPT_VERSION, variant)
+            if cached is not MISS:
+                return cached
+        if self.extractor_backend == "local":
+            locations = extract_locations_local(text, self.gazetteer, client = self.client, model_name = model_name,
+                                                nlp = self.ner_model, retry_policy = self.retry_policy)
+        elif self.model_tiers is not None:
+            locations = self.model_tiers.run(
+                lambda tier_model, usage: ext_locations(text, self.client, tier_model, chunk_tokens = self.chunk_tokens,
+                                                        overlap_tokens = self.overlap_tokens,
+                                                        max_concurrency = self.max_llm_concurrency, test_mode = False,
+                                                        retry_policy = self.retry_policy, usage = usage,
+                                                        prefix_cache = self.prefix_cache))
+        else:
+            locations = ext_locations(text, self.client, model_name, chunk_tokens = self.chunk_tokens,
+                                      overlap_tokens = self.overlap_tokens,
+                                      max_concurrency = self.max_llm_concurrency, test_mode = False,
+                                      retry_policy = self.retry_policy, prefix_cache = self.prefix_cache)
+        # a failed call or chunk raised ExtractionFailed above, so only complete results are cached
+        if self.llm_cache is not None:
+            self.llm_cache.put_result(text, model_name, PROMPT_VERSION, locations, variant)
+        return locations
 
-    def coord_finder(self, locations):
-        return ext_coordinates(locations, self.geocode, test_mode = False)
+    def coord_finder(self, locations, on_row = None, as_table = False):
+        from geocode_loc_finder import geocode_nominatim as ext_coordinates
+        with get_metrics().timer("stage_seconds", stage="geocode"):
+            return ext_coordinates(locations, self.geocode, test_mode = False, store = self.geocode_store, memo = self.geocode_memo,
+                                   gazetteer = self.gazetteer, max_workers = self.rate_policy.max_in_flight,
+                                   landmark_mode = self.landmark_mode, on_row = on_row, as_table = as_table)
 
-    def create_intmap(self, coord_df, open_in_browser: bool = True):
+    def create_intmap(self, coord_df, open_in_browser: bool = True, render: str = "auto"):
         """
         Build the folium map. If open_in_browser=True, save and open it.
         Always return the folium.Map object so Streamlit can render it.
+        ``render`` picks per-point markers, one GeoJSON layer or clustering
+        (see ``create_styled_map``); "auto" chooses from the number of points.
         """
-        fmap = create_styled_map(coord_df)
+        from map_viz import create_styled_map, save_open_map_in_browser
+        with get_metrics().timer("stage_seconds", stage="map"):
+            fmap = create_styled_map(coord_df, render=render)
         if open_in_browser:
             save_open_map_in_browser(fmap)
         return fmap
     
 
-    def process_article(self, input_text: str, is_url: bool = False, for_streamlit: bool = False) -> Dict:
-        """Main processing function."""
-        
-        # Extract/load text
+    def load_article_text(self, input_text: str, is_url: bool = False, parse_pool = None) -> str:
+        """Return the article text for a URL or raw text input (fetch stage).
+
+        Raises ``NoArticleExtracted`` / ``NoLocationsFound`` early when the
+        pre-filter rejects the page, before any LLM call is made.
+        """
+        status_code = None
         if is_url:
-            print(f"Fetching article from URL: {input_text}")
-            article_text = self.url_text_extractor(input_text)
+            fetched = fetch_article(input_text, fetcher=self.fetcher, parse_pool=parse_pool)
+            article_text, status_code = fetched.text, fetched.status_code
             if not article_text:
-                raise NoArticleExtracted("Article URL could not be fetched")
+                raise NoArticleExtracted(f"Article URL could not be fetched (HTTP {status_code})")
         else:
             article_text = input_text
 
-        if "403 Forbidden" in article_text and len(article_text) < 100:
+        if self.prefilter:
+            verdict = prefilter_article(article_text, status_code=status_code, gazetteer=self.gazetteer, fetched=is_url)
+            if verdict.blocked:
+                raise NoArticleExtracted(f"Could not fetch article: {verdict.reason}")
+            if not verdict.passed:
+                raise NoLocationsFound(f"Article does not seem to reference any real-world geographic location ({verdict.reason})")
+
+        if is_url and "403 Forbidden" in article_text and len(article_text) < 100:
             raise NoArticleExtracted("Could not fetch article: newspaper is likely blocking AI/bots agents")
-        else:
-            print("     -article extracted")
+        return article_text
+
+    def extract_article_locations(self, article_text: str) -> Dict:
+        """Run the LLM on the article text (extraction stage)."""
+        with get_metrics().timer("stage_seconds", stage="llm"):
+            locations = self.location_extractor(article_text)
+        if locations == {}:
+            raise NoLocationsFound("Article does not seem to reference any real-world geographic location")
+        return locations
+
+    def process_article(self, input_text: str, is_url: bool = False, for_streamlit: bool = False) -> Dict:
+        """Main processing function."""
+        metrics = get_metrics()
+        try:
+            with metrics.timer("stage_seconds", stage="article"):
+                result = self._process_article(input_text, is_url, for_streamlit)
+        except Exception as e:
+            metrics.inc("articles_total", result=type(e).__name__)
+            raise
+        metrics.inc("articles_total", result="ok")
+        return result
+
+    def _process_article(self, input_text: str, is_url: bool, for_streamlit: bool) -> Dict:
+        
+        # Extract/load text
+        if is_url:
+            print(f"Fetching article from URL: {input_text}")
+        article_text = self.load_article_text(input_text, is_url=is_url)
+        print("     -article extracted")
         
         # Extract locations
         print("Extracting locations using Gemini API...")
-        locations = self.location_extractor(article_text)
-        if locations == {}:
-            raise NoLocationsFound("Article does not seem to reference any real-world geographic location")
-        else:
-            print("     -locations extracted")
+        locations = self.extract_article_locations(article_text)
+        print("     -locations extracted")
 
         # Fetch coordinates
         print("Extracting coordinate")
@@ -146,6 +362,218 @@ class ArticleLocationExtractor:
             }
 
         return {}
+
+    def iter_process_article(self, input_text: str, is_url: bool = False) -> Iterator[Dict]:
+        """Streaming variant of ``process_article``: yield events as the pipeline progresses.
+
+        Lets a UI show the article as soon as it is fetched and add each location
+        to the map as soon as it is geocoded, instead of waiting for the whole run.
+
+        Yields, in order:
+            ``{"event": "article", "article_text": str}`` once the text is loaded,
+            ``{"event": "locations", "locations": dict}`` once Gemini has answered,
+            ``{"event": "location", "index": int, "row": dict}`` for each geocoded
+            row, in completion order (``row`` has the columns of ``coords_df``),
+            ``{"event": "done", "article_text", "locations", "coords_df"}`` at the end.
+
+        Raises:
+            The same exceptions as ``process_article``, from the stage that failed.
+        """
+        article_text = self.load_article_text(input_text, is_url=is_url)
+        yield {"event": "article", "article_text": article_text}
+
+        locations = self.extract_article_locations(article_text)
+        yield {"event": "locations", "locations": locations}
+
+        # geocode on a helper thread and relay each row as it resolves
+        rows = queue.Queue()
+        outcome = {}
+
+        def _geocode():
+            try:
+                outcome["coords_df"] = self.coord_finder(locations, on_row=lambda ix, row: rows.put((ix, row)))
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                rows.put(_DONE)
+        threading.Thread(target=_geocode, daemon=True).start()
+
+        while True:
+            item = rows.get()
+            if item is _DONE:
+                break
+            yield {"event": "location", "index": item[0], "row": item[1]}
+        if "error" in outcome:
+            raise outcome["error"]
+        yield {"event": "done", "article_text": article_text, "locations": locations,
+               "coords_df": outcome["coords_df"]}
+
+    def process_articles(
+        self,
+        inputs: Iterable[Union[str, Dict[str, str]]],
+        is_url: bool = False,
+        fetch_workers: int = 8,
+        llm_workers: int = 4,
+        geocode_workers: int = 1,
+        queue_size: int = 16,
+        parse_workers: int = None,
+        as_table: bool = False,
+    ) -> Iterator[Dict]:
+        """Process a corpus of articles through overlapping pipeline stages.
+
+        Fetching, Gemini extraction and geocoding each run in their own pool of
+        worker threads, connected by bounded queues. While article N is being
+        geocoded, article N+1 can already be in the LLM and N+2 being fetched.
+        The bounded queues apply back-pressure so a slow stage (usually the
+        rate-limited geocoder) does not let the others run arbitrarily ahead.
+
+        Args:
+            inputs: Iterable of articles. Each item is either a string (a URL if
+                ``is_url`` else raw text) or a dict with a ``"url"`` or ``"text"`` key.
+                Items without either, and exception instances (such as the
+                ``InvalidInput`` that ``read_input_file`` yields for malformed
+                lines), become failed results.
+            is_url: How to interpret plain string items.
+            fetch_workers: Number of threads downloading articles. The fetcher's
+                per-host limits keep this polite to each outlet.
+            llm_workers: Number of threads calling Gemini concurrently.
+            geocode_workers: Number of threads geocoding. Keep at 1 for the
+                public Nominatim endpoint, which allows 1 request/second.
+            queue_size: Capacity of each inter-stage queue.
+            parse_workers: Processes running the CPU-bound trafilatura parsing of
+                downloaded pages (default: one per core). ``0`` parses on the fetch threads.
+            as_table: Geocode into a columnar ``LocationTable`` instead of a
+                DataFrame (see ``geocode_nominatim``), e.g. to aggregate a corpus.
+
+        Yields:
+            One dict per article, in completion order, with keys ``"index"``
+            (position in ``inputs``), ``"input"``, ``"article_text"``,
+            ``"locations"``, ``"coords_df"`` (a ``LocationTable`` with ``as_table``)
+            and ``"error"`` (the exception that stopped this article, or None).
+            Failed articles do not stop the batch.
+
+        Raises:
+            Exception: Whatever iterating ``inputs`` raised, once the articles
+                read before it have been yielded.
+        """
+        stop = threading.Event()
+        fetch_q = queue.Queue(maxsize=queue_size)
+        llm_q = queue.Queue(maxsize=queue_size)
+        geo_q = queue.Queue(maxsize=queue_size)
+        out_q = queue.Queue(maxsize=queue_size)
+
+        def _put(q, item):
+            # blocking put that gives up when the consumer went away
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        feed_errors = []
+
+        def _feed():
+            # always ends the stream, even if `inputs` itself raises, so the stages and the consumer finish
+            try:
+                for ix, item in enumerate(inputs):
+                    if stop.is_set():
+                        break
+                    job = {"index": ix, "input": item, "is_url": is_url, "article_text": None,
+                           "locations": None, "coords_df": None, "error": None}
+                    if isinstance(item, Exception):
+                        job["error"] = item
+                    elif isinstance(item, dict):
+                        if isinstance(item.get("url"), str):
+                            job["input"], job["is_url"] = item["url"], True
+                        elif isinstance(item.get("text"), str):
+                            job["input"], job["is_url"] = item["text"], False
+                        else:
+                            job["error"] = InvalidInput(f"Input item has no \"url\" or \"text\" string: {item!r:.200}")
+                    _put(fetch_q, job)
+            except Exception as e:
+                feed_errors.append(e)
+            finally:
+                _put(fetch_q, _DONE)
+
+        parse_pool = new_parse_pool(parse_workers) if parse_workers != 0 else None
+
+        def _fetch(job):
+            job["article_text"] = self.load_article_text(job["input"], is_url=job["is_url"], parse_pool=parse_pool)
+
+        def _extract(job):
+            job["locations"] = self.extract_article_locations(job["article_text"])
+
+        def _geocode(job):
+            job["coords_df"] = self.coord_finder(job["locations"], as_table=as_table)
+
+        def _worker(in_q, out, stage_fn):
+            while not stop.is_set():
+                try:
+                    job = in_q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if job is _DONE:
+                    in_q.put(_DONE)  # let sibling workers see it too
+                    return
+                if job["error"] is None:
+                    try:
+                        stage_fn(job)
+                    except Exception as e:
+                        job["error"] = e
+                _put(out, job)
+
+        def _stage(in_q, out, stage_fn, n_workers):
+            workers = [threading.Thread(target=_worker, args=(in_q, out, stage_fn), daemon=True)
+                       for _ in range(max(1, n_workers))]
+            for w in workers:
+                w.start()
+
+            def _close():
+                for w in workers:
+                    w.join()
+                _put(out, _DONE)
+            threading.Thread(target=_close, daemon=True).start()
+
+        threading.Thread(target=_feed, daemon=True).start()
+        _stage(fetch_q, llm_q, _fetch, fetch_workers)
+        _stage(llm_q, geo_q, _extract, llm_workers)
+        _stage(geo_q, out_q, _geocode, geocode_workers)
+
+        try:
+            while True:
+                job = out_q.get()
+                if job is _DONE:
+                    if feed_errors:
+                        raise feed_errors[0]  # reading the inputs failed; the items read before it were yielded
+                    return
+                del job["is_url"]
+                get_metrics().inc("articles_total", result="ok" if job["error"] is None else type(job["error"]).__name__)
+                yield job
+        finally:
+            stop.set()
+            if parse_pool is not None:
+                parse_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def read_input_file(path: str) -> Iterator[Union[str, Dict[str, str]]]:
+    """Read batch inputs: one URL per line, or JSONL objects with a "url" or "text" key.
+
+    A line that is not valid JSON is yielded as an ``InvalidInput`` error, which
+    ``process_articles`` reports as a failed item instead of stopping the batch.
+    """
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield InvalidInput(f"{path}:{n}: invalid JSON ({e})")
+            else:
+                yield {"url": line}
     
 
 def main():
@@ -153,17 +581,31 @@ def main():
     parser.add_argument("--api-key", help="Gemini API key")
     parser.add_argument("--url", help="URL of news article to process")
     parser.add_argument("--text", help="Direct text input instead of URL")
+    parser.add_argument("--input-file", help="Batch mode: file with one URL per line, or JSONL with a \"url\" or \"text\" key per line")
+    parser.add_argument("--output", default="batch_locations.csv", help="Batch mode: CSV (or .parquet, needs pyarrow) file collecting all geocoded locations")
+    parser.add_argument("--llm-workers", type=int, default=4, help="Batch mode: concurrent Gemini calls")
+    parser.add_argument("--export-tiles", help="Batch mode: also export all locations as a tiled map viewer into this folder")
+    parser.add_argument("--metrics-file", help="Write Prometheus-format stage timings and counters to this file when done")
+    parser.add_argument("--log-metrics", action="store_true", help="Log every timing/counter as a JSON line on stderr")
+    parser.add_argument("--model-tiers", help="Comma-separated models tried in order, escalating on invalid output (e.g. gemini-2.5-flash,gemini-2.5-pro)")
     
     args = parser.parse_args()
+    load_dotenv()  # load environment variables from .env file
     
-    if not any([args.url, args.text]):
-        print("Please provide either --url or --text")
+    if not any([args.url, args.text, args.input_file]):
+        print("Please provide either --url, --text or --input-file")
         sys.exit(1)
     
-    extractor = ArticleLocationExtractor(args.api_key)
+    if args.log_metrics:
+        get_metrics().add_sink(json_log_sink(sys.stderr))
+    model_tiers = args.model_tiers.split(",") if args.model_tiers else None
+    extractor = ArticleLocationExtractor(args.api_key, model_tiers=model_tiers)
     
     try:
-        if args.url:
+        if args.input_file:
+            run_batch(extractor, args.input_file, args.output, llm_workers=args.llm_workers,
+                      export_dir=args.export_tiles)
+        elif args.url:
             extractor.process_article(args.url, is_url=True)
         else:
             extractor.process_article(args.text, is_url=False)
@@ -172,7 +614,53 @@ def main():
         print("\nOperation cancelled by user")
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if args.metrics_file:
+            with open(args.metrics_file, "w", encoding="utf-8") as f:
+                f.write(get_metrics().to_prometheus())
+
+
+def run_batch(extractor: ArticleLocationExtractor, input_file: str, output: str, llm_workers: int = 4,
+              export_dir: str = None):
+    """Run ``process_articles`` over an input file and write all locations to one file.
 
+    Locations are accumulated in a columnar ``LocationTable`` (dictionary-encoded
+    text, float coordinates), so a corpus of many articles stays compact in memory.
+    ``output`` is written as Parquet if it ends with ``.parquet`` (needs ``pyarrow``),
+    else as CSV. With ``export_dir``, the locations are also exported as static
+    map tiles plus a viewer (``tile_export.export_tiled_map``).
+    """
+    from location_table import LocationTable
+
+    all_locations, n_ok, n_failed = LocationTable(), 0, 0
+    for res in extractor.process_articles(read_input_file(input_file), llm_workers=llm_workers, as_table=True):
+        if res["error"] is not None:
+            n_failed += 1
+            print(f"[{res['index']}] failed: {type(res['error']).__name__}: {res['error']}")
+            continue
+        n_ok += 1
+        table = res["coords_df"]
+        print(f"[{res['index']}] {len(table)} locations")
+        table.add_constant("article_index", res["index"])
+        table.add_constant("article_input", res["input"][:200])
+        all_locations.extend(table)
+
+    if len(all_locations):
+        if output.endswith(".parquet"):
+            all_locations.write_parquet(output)
+        else:
+            all_locations.to_dataframe().to_csv(output, index=False)
+        print(f"Wrote {len(all_locations)} locations to {output}")
+        if export_dir:
+            from tile_export import export_tiled_map
+            index = export_tiled_map(all_locations.to_dataframe(), export_dir)
+            print(f"Exported {index['count']} mapped locations in {len(index['tiles'])} tiles to {export_dir} "
+                  f"(view with: python -m http.server -d {export_dir})")
+    print(f"Batch done: {n_ok} articles processed, {n_failed} failed")
+    if extractor.model_tiers is not None:
+        tiers = extractor.model_tiers.summary()
+        print(f"Model tiers: {tiers['served_by_first_tier']:.0%} served by {extractor.model_tiers.tiers[0]}, "
+              f"estimated cost ${tiers['cost_usd']:.4f}")
 
 
 if __name__ == "__main__":
@@ -1,17 +1,101 @@
 import folium
+from folium.plugins import FastMarkerCluster
 import pandas as pd
+import hashlib
 import os
 import webbrowser
 
+# the only columns `create_styled_map` draws from
+MAP_COLUMNS = ['lat', 'lon', 'map_name', 'summary']
+
+# render="auto" thresholds: individual styled markers up to MARKER_LIMIT points,
+# one GeoJSON layer up to CLUSTER_THRESHOLD, client-side clustering above
+MARKER_LIMIT = 200
+CLUSTER_THRESHOLD = 2000
+
+# builds each clustered marker in the browser from a compact [lat, lon, name, summary] row;
+# textContent keeps names/summaries from being interpreted as HTML
+_CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {radius: 6, color: "#d33", weight: 1, fillOpacity: 0.8});
+    var div = document.createElement("div");
+    div.style.width = "200px";
+    var title = document.createElement("h4");
+    title.textContent = row[2];
+    var text = document.createElement("p");
+    text.textContent = row[3];
+    div.appendChild(title);
+    div.appendChild(text);
+    marker.bindPopup(div, {maxWidth: 250});
+    marker.bindTooltip(row[2]);
+    return marker;
+}
+"""
+
+
+def map_data_key(locations_data):
+    """Stable hash of the map-relevant columns of a locations DataFrame, used to cache rendered maps."""
+    cols = [c for c in MAP_COLUMNS if c in locations_data.columns]
+    hashed = pd.util.hash_pandas_object(locations_data[cols].astype(str), index=False)
+    return hashlib.sha256(hashed.values.tobytes()).hexdigest()
+
+
+def locations_to_geojson(locations_data):
+    """
+    Build a GeoJSON FeatureCollection of points (properties `map_name`, `summary`)
+    from the lat/lon/map_name/summary columns, column-wise rather than row by row.
+    Rows without coordinates are skipped.
+    """
+    df = locations_data.loc[locations_data.lat.notnull() & locations_data.lon.notnull()]
+    names = df['map_name'].astype(str).tolist() if 'map_name' in df else [''] * len(df)
+    summaries = df['summary'].astype(str).tolist() if 'summary' in df else [''] * len(df)
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature",
+             "geometry": {"type": "Point", "coordinates": [lon, lat]},
+             "properties": {"map_name": name, "summary": summary}}
+            for lat, lon, name, summary in zip(df.lat.astype(float).tolist(), df.lon.astype(float).tolist(),
+                                               names, summaries)
+        ],
+    }
+
+
+def add_geojson_layer(m, locations_data):
+    """Add all points as one GeoJSON layer of circle markers, with the summary in a popup."""
+    folium.GeoJson(
+        locations_to_geojson(locations_data),
+        name="locations",
+        marker=folium.CircleMarker(radius=6, color="#d33", weight=1, fill=True, fill_opacity=0.8),
+        tooltip=folium.GeoJsonTooltip(fields=["map_name"], labels=False),
+        popup=folium.GeoJsonPopup(fields=["map_name", "summary"], labels=False, max_width=250),
+    ).add_to(m)
+    return m
+
+
+def add_cluster_layer(m, locations_data):
+    """Add all points as a client-side clustered layer; markers are only created in the browser."""
+    df = locations_data.loc[locations_data.lat.notnull() & locations_data.lon.notnull()]
+    rows = list(zip(df.lat.astype(float).tolist(), df.lon.astype(float).tolist(),
+                    df['map_name'].astype(str).tolist(), df['summary'].astype(str).tolist()))
+    FastMarkerCluster(rows, callback=_CLUSTER_CALLBACK, name="locations").add_to(m)
+    return m
+
+
 # Alternative: Create map with different marker styles
-def create_styled_map(locations_data,map_center=None, zoom_start=10):
+def create_styled_map(locations_data,map_center=None, zoom_start=10, render="auto",
+                      marker_limit=MARKER_LIMIT, cluster_threshold=CLUSTER_THRESHOLD):
     """
     Create an interactive map with location points and hover text.
     
     Parameters:
-    locations_data: list of dictionaries with keys 'lat', 'lon', 'map_name', 'summary'
+    locations_data: DataFrame with columns 'lat', 'lon', 'map_name', 'summary'
     map_center: tuple (lat, lon) for map center, if None will calculate from data
     zoom_start: initial zoom level
+    render: "markers" (one styled folium.Marker per point), "geojson" (a single
+        GeoJSON layer, much smaller HTML), "cluster" (client-side clustering, for
+        10k+ points) or "auto" (markers up to `marker_limit` points, geojson up to
+        `cluster_threshold`, cluster above)
     
     Returns:
     folium.Map object
@@ -36,6 +120,16 @@ def create_styled_map(locations_data,map_center=None, zoom_start=10):
         m.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])  # adjusts center & zoom
  
     
+    if render == "auto":
+        n = len(locations_data)
+        render = "markers" if n <= marker_limit else "geojson" if n <= cluster_threshold else "cluster"
+    if render == "geojson":
+        return add_geojson_layer(m, locations_data)
+    if render == "cluster":
+        return add_cluster_layer(m, locations_data)
+    if render != "markers":
+        raise ValueError(f"Unknown render mode {render!r}, expected 'auto', 'markers', 'geojson' or 'cluster'.")
+
     # Different colors for variety
     colors = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 'lightred', 
               'beige', 'darkblue', 'darkgreen', 'cadetblue', 'darkpurple', 'white', 'pink', 'lightblue', 'lightgreen', 'gray', 'black', 'lightgray']
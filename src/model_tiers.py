@@ -0,0 +1,219 @@
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from gazetteer import LocalGazetteer, fold_name, CITY
+from nlp_loc_extractor import ExtractionFailed
+
+DEFAULT_TIERS = ["gemini-2.5-flash", "gemini-2.5-pro"]
+
+# USD per million (input, output) tokens; list prices, override for your plan
+MODEL_PRICES = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+
+def check_locations(locations: Dict[str, List[str]], gazetteer: Optional[LocalGazetteer] = None,
+                    max_unresolved: float = 0.5) -> List[str]:
+    """
+    Sanity checks on a validated extraction, beyond the schema checks of
+    `validate_locations`.
+
+    Every row must name at least one place and have a summary, and a city must
+    come with a state or country. With a gazetteer, the hierarchy is checked
+    (a known city must lie in the given state/country, and in the given county
+    when the gazetteer knows that county: San Jose is not in Alameda), and more
+    than `max_unresolved` of the non-landmark rows failing to resolve locally
+    counts as not geocodable.
+
+    Returns
+    -------
+    List[str]
+        Problems found, empty if the extraction looks sound.
+    """
+    if not locations:
+        return []
+    problems = []
+    n = len(locations["summary"])
+    structured, unresolved = 0, 0
+    for i in range(n):
+        row = {k: v[i] for k, v in locations.items()}
+        q = {qk: row[k] for qk, k in (("city", "cities"), ("county", "provinces_counties"),
+                                      ("state", "states"), ("country", "countries")) if row[k] != "None"}
+        if not q and row["landmarks"] == "None":
+            problems.append(f"row {i} names no place")
+            continue
+        if row["summary"] == "None":
+            problems.append(f"row {i} has no summary")
+        if "city" in q and "state" not in q and "country" not in q:
+            problems.append(f"row {i}: city {q['city']!r} has no state or country")
+        if gazetteer is None or not q or row["landmarks"] != "None":
+            continue
+
+        structured += 1
+        if gazetteer.resolve(q) is None:
+            unresolved += 1
+            if "city" in q and gazetteer.lookup(q["city"], CITY):
+                where = ", ".join(q[k] for k in ("state", "country") if k in q)
+                problems.append(f"row {i}: {q['city']!r} is not in {where!r}")
+        elif "city" in q and "county" in q and fold_name(q["city"]) != fold_name(q["county"]):
+            counties = gazetteer.admin2_lookup.get(fold_name(q["county"]))
+            cities = gazetteer.lookup(q["city"], CITY)
+            if counties and cities and not any(
+                    (gazetteer.country_code[f], gazetteer.admin1_code[f], gazetteer.admin2_code[f]) in counties
+                    for f in cities):
+                problems.append(f"row {i}: {q['city']!r} is not in county {q['county']!r}")
+
+    if structured and unresolved / structured > max_unresolved:
+        problems.append(f"{unresolved} of {structured} rows cannot be geocoded")
+    return problems
+
+
+@dataclass
+class TierStats:
+    """Counters of one model tier of a `ModelTierPolicy`."""
+    calls: int = 0
+    accepted: int = 0
+    escalated: int = 0  # calls whose output failed the checks and went to the next tier
+    failed: int = 0  # calls that raised `ExtractionFailed` (also counted as escalated unless last tier)
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_seconds: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+
+class ModelTierPolicy:
+    """
+    Route extractions to the cheapest model tier whose output passes validation.
+
+    Each article goes to the first tier (a flash-class model). Its output is
+    checked with `check_locations`; only when a problem is found (or nothing
+    was extracted and `escalate_empty` is set), or when the call failed after
+    its retries (`ExtractionFailed`, e.g. a quota error), is the article sent
+    again to the next tier. The last tier's answer is always kept, and its
+    failure is raised. Latency, tokens, cost and
+    escalations are counted per tier, and `summary()` aggregates them.
+
+    Parameters
+    ----------
+    tiers : list of str, optional
+        Model names from cheapest to most capable, by default `DEFAULT_TIERS`.
+    prices : dict, optional
+        Model name -> (USD per million input tokens, USD per million output
+        tokens), by default `MODEL_PRICES`. Unknown models cost 0.
+    gazetteer : LocalGazetteer, optional
+        Enables the hierarchy and geocodability checks.
+    escalate_empty : bool, optional
+        Escalate when a tier finds no location at all, by default True (an
+        article that passed the pre-filter names places, so an empty answer from
+        a small model is more likely a miss than a true negative).
+    max_unresolved : float, optional
+        Passed to `check_locations`, by default 0.5.
+    verbose : bool, optional
+        Print a line for each escalation, by default True.
+    """
+
+    def __init__(self, tiers: Optional[List[str]] = None, prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                 gazetteer: Optional[LocalGazetteer] = None, escalate_empty: bool = True,
+                 max_unresolved: float = 0.5, verbose: bool = True):
+        self.tiers = list(tiers or DEFAULT_TIERS)
+        if not self.tiers:
+            raise ValueError("At least one model tier is required.")
+        self.prices = prices if prices is not None else MODEL_PRICES
+        self.gazetteer = gazetteer
+        self.escalate_empty = escalate_empty
+        self.max_unresolved = max_unresolved
+        self.verbose = verbose
+        self.stats = {m: TierStats() for m in self.tiers}
+        self._lock = threading.Lock()
+
+    @property
+    def cache_name(self) -> str:
+        """Name under which tiered results are cached (e.g. "gemini-2.5-flash>gemini-2.5-pro")."""
+        return ">".join(self.tiers)
+
+    def cost(self, model_name: str, input_tokens: int, output_tokens: int) -> float:
+        price_in, price_out = self.prices.get(model_name, (0.0, 0.0))
+        return (input_tokens * price_in + output_tokens * price_out) / 1e6
+
+    def run(self, extract_fn: Callable[[str, Dict[str, int]], Dict[str, List[str]]]) -> Dict[str, List[str]]:
+        """
+        Run `extract_fn(model_name, usage)` tier by tier until an output passes the checks.
+
+        `extract_fn` must add the tokens it used to `usage["input_tokens"]` and
+        `usage["output_tokens"]` (see the `usage` argument of
+        `extract_locations_with_gemini`). An `ExtractionFailed` it raises
+        escalates to the next tier, and is re-raised from the last one.
+        """
+        locations: Dict[str, List[str]] = {}
+        for i, model_name in enumerate(self.tiers):
+            usage = {"input_tokens": 0, "output_tokens": 0}
+            last = i == len(self.tiers) - 1
+            failure = None
+            start = time.monotonic()
+            try:
+                locations = extract_fn(model_name, usage)
+            except ExtractionFailed as e:
+                failure, locations = e, {}
+            elapsed = time.monotonic() - start
+
+            if failure is not None:
+                problems = [f"extraction failed: {failure}"]
+            elif last:
+                problems = []
+            else:
+                problems = check_locations(locations, self.gazetteer, self.max_unresolved)
+                if not locations and self.escalate_empty:
+                    problems = ["no locations extracted"]
+
+            with self._lock:
+                s = self.stats[model_name]
+                s.calls += 1
+                s.latency_seconds.append(elapsed)
+                s.input_tokens += usage["input_tokens"]
+                s.output_tokens += usage["output_tokens"]
+                s.cost_usd += self.cost(model_name, usage["input_tokens"], usage["output_tokens"])
+                if failure is not None:
+                    s.failed += 1
+                if not problems:
+                    s.accepted += 1
+                elif not last:
+                    s.escalated += 1
+            if failure is not None and last:
+                raise failure
+            if not problems:
+                return locations
+            if self.verbose:
+                print(f"{model_name} output rejected ({'; '.join(problems[:3])}), escalating to {self.tiers[i + 1]}")
+        return locations
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-tier and overall counters: calls, escalation rate, latency, tokens and cost."""
+        with self._lock:
+            tiers = {}
+            for m, s in self.stats.items():
+                lat = sorted(s.latency_seconds)
+                tiers[m] = {
+                    "calls": s.calls,
+                    "accepted": s.accepted,
+                    "failed": s.failed,
+                    "escalation_rate": s.escalated / s.calls if s.calls else 0.0,
+                    "median_latency_seconds": statistics.median(lat) if lat else 0.0,
+                    "p95_latency_seconds": lat[int(0.95 * (len(lat) - 1))] if lat else 0.0,
+                    "input_tokens": s.input_tokens,
+                    "output_tokens": s.output_tokens,
+                    "cost_usd": s.cost_usd,
+                }
+            articles = self.stats[self.tiers[0]].calls
+            first_tier = self.stats[self.tiers[0]].accepted
+        return {
+            "articles": articles,
+            "served_by_first_tier": first_tier / articles if articles else 0.0,
+            "cost_usd": sum(t["cost_usd"] for t in tiers.values()),
+            "tiers": tiers,
+        }
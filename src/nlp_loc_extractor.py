@@ -1,74 +1,271 @@
 import json
 import os
 import re
-from typing import Dict, List, Any
+import threading
 import time
-from google import genai
+from typing import Dict, List, Any, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
 
-from dotenv import load_dotenv
-load_dotenv()  #load environment variables from .env file
+from retry_policy import RetryPolicy
+from instrumentation import get_metrics
 
+# google.genai.types is imported where a request is built: it is slow to import and
+# not needed to parse, validate or merge responses
 
+# bump whenever the prompt changes, so cached extractions made with the old one are ignored
+PROMPT_VERSION = "3"
+LOCATION_KEYS = ["cities", "provinces_counties", "states", "countries", "landmarks", "summary"]
+CHARS_PER_TOKEN = 4  # rough average for English news text
+# default overlap between consecutive chunks, as a fraction of the chunk size (100 tokens for 2500)
+CHUNK_OVERLAP_FRACTION = 0.04
+# smallest prefix (tokens) Gemini accepts in an explicit context cache, by model name prefix;
+# other models get the largest minimum
+MIN_CACHE_TOKENS = {"gemini-2.5-flash": 1024, "gemini-2.5-pro": 4096}
 
-def parse_fallback_response(text: str) -> Dict[str, List[str]]:
+
+# JSON schema the model output is constrained to in structured-output mode
+LOCATION_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {k: {"type": "ARRAY", "items": {"type": "STRING"}} for k in LOCATION_KEYS},
+    "property_ordering": LOCATION_KEYS,
+}
+
+# Static part of the extraction prompt. It is identical for every article, so it is sent as the
+# system instruction (or held in a provider-side context cache) and only the article text varies.
+SYSTEM_INSTRUCTION = """\
+Extract ALL real-world locations mentioned in the news article you are given, with a very concise summary of why each location is mentioned.
+
+Return JSON with six parallel lists of the same length, one item per location:
+{"cities": [...], "provinces_counties": [...], "states": [...], "countries": [...], "landmarks": [...], "summary": [...]}
+i.e. if there are 3 locations, every list has 3 items.
+
+Only include actual geographical locations, not fictional places or organization names. Avoid duplicates and be comprehensive.
+If a category does not apply or is not found, use your knowledge to fill in the most appropriate value, and use "None" if there is any doubt.
+The hierarchy must be consistent: the city of San Jose belongs to the county of Santa Clara, not Alameda or San Mateo.
+If the article mentions no real-world location, return {}.
+
+Example 1 article:
+The Dixie Fire started on July 13, 2021 in Feather River Canyon southeast of Lassen Volcanic National Park. The fire entered the southeast corner of the park near Juniper Lake on August 5, 2021 at which point Lassen Volcanic National Park entered into unified command with USFS and CAL FIRE to implement a full suppression strategy.
+The Dixie Fire reached its final size of 73,240 acres within the park on September 30. On October 26, the Dixie Fire reached 100% containment with a total size of 963,309 acres making it the largest single fire in California history.
+Example 1 response:
+{"cities": ["None", "None", "None"], "provinces_counties": ["Lassen", "Lassen", "Lassen"], "states": ["California", "California", "California"], "countries": ["USA", "USA", "USA"], "landmarks": ["Feather River Canyon", "Lassen Volcanic National Park", "Juniper Lake"], "summary": ["Dixie Fire ignition point (July 13, 2021)", "Major impact area. Dixie Fire entered Aug 5 and burned 73,240 acres inside the park.", "Entry point where the fire crossed into the park"]}
+
+Example 2 article:
+Swift performed 149 shows between March 2023 and December 2024. The tour traveled to 51 cities across 21 countries. A total of 10,168,008 people purchased $2,077,618,725 in tickets, Swift's company told the NYT.
+Swift's biggest crowd (of both the tour and her entire career) was 96,000 people at the Melbourne Cricket Ground in Australia in February.
+In July 2023, Seattle fans danced so hard that they created the seismic equivalent of a 2.3 magnitude earthquake.
+Example 2 response:
+{"cities": ["Melbourne", "Seattle"], "provinces_counties": ["None", "King"], "states": ["Victoria", "Washington"], "countries": ["Australia", "USA"], "landmarks": ["Melbourne Cricket Ground", "None"], "summary": ["Hosted Swift’s biggest crowd ever: 96,000 people (February).", "Fans’ dancing created a seismic event equivalent to magnitude 2.3 (July 2023)."]}
+
+Example 3 article:
+Scientists have long known that the brain’s visual system isn’t fully hardwired from the start, but the authors of a new study still weren’t prepared for the degree of rewiring they observed in mice as it happened in real-time.
+Former graduate student Katya Tsimring led the study, published this month in Nature Communications. “We were surprised by how much change there is,” says senior author Mriganka Sur.
+Example 3 response:
+{}
+"""
+
+# values the model uses for "not applicable", normalized to the string "None"
+_NONE_VALUES = {"", "none", "null", "n/a", "na", "unknown", "-"}
+
+_usage_lock = threading.Lock()
+
+
+class ExtractionFailed(RuntimeError):
+    """A Gemini extraction gave up after its retries (as opposed to finding no location)."""
+
+
+def record_usage(usage: Optional[Dict[str, int]], response: Any) -> None:
+    """Add a response's token counts to `usage` (thinking tokens are billed as output)."""
+    meta = getattr(response, "usage_metadata", None)
+    if usage is None or meta is None:
+        return
+    with _usage_lock:
+        usage["input_tokens"] = usage.get("input_tokens", 0) + (meta.prompt_token_count or 0)
+        usage["output_tokens"] = usage.get("output_tokens", 0) + (meta.candidates_token_count or 0) \
+            + (getattr(meta, "thoughts_token_count", None) or 0)
+        usage["cached_tokens"] = usage.get("cached_tokens", 0) + (getattr(meta, "cached_content_token_count", None) or 0)
+
+
+class PromptPrefixCache:
     """
-    Parse a loosely structured text response to recover location lists.
-    This fallback is used when a model fails to return valid JSON.
+    Provider-side context cache holding the static prompt prefix (by default
+    `SYSTEM_INSTRUCTION`), one entry per model.
+
+    The cache entry is created on first use with `client.caches.create` and
+    recreated shortly before its `ttl` runs out. Models whose minimum cacheable
+    size (`MIN_CACHE_TOKENS`) exceeds the estimated size of the prefix are not
+    even tried; they, and models or accounts on which creating the cache fails,
+    are remembered, and their calls fall back to sending the prefix as a plain
+    system instruction, where Gemini's implicit prefix caching still applies.
+    The current `SYSTEM_INSTRUCTION` (~800 tokens) is below every minimum, so
+    this only pays off once the prompt grows.
 
     Parameters
     ----------
-    text : str
-        The raw, unstructured model output to parse.
+    ttl : int, optional
+        Lifetime of a cache entry in seconds, by default 3600.
+    system_instruction : str, optional
+        Prefix to cache, by default `SYSTEM_INSTRUCTION`. Calls made with this
+        cache send the same text inline when it cannot be cached.
+    """
+
+    def __init__(self, ttl: int = 3600, system_instruction: str = SYSTEM_INSTRUCTION):
+        self.ttl = ttl
+        self.system_instruction = system_instruction
+        self._entries: Dict[str, Tuple[str, float]] = {}  # model -> (cache name, refresh time)
+        self._unsupported = set()
+        self._lock = threading.Lock()
+
+    def get(self, client: Any, model_name: str) -> Optional[str]:
+        """Return the cache name to pass as `cached_content`, or None to send the prefix inline."""
+        with self._lock:
+            if model_name in self._unsupported:
+                return None
+            entry = self._entries.get(model_name)
+            if entry is not None and time.monotonic() < entry[1]:
+                return entry[0]
+            prefix_tokens = len(self.system_instruction) // CHARS_PER_TOKEN
+            min_tokens = min_cache_tokens(model_name)
+            if prefix_tokens < min_tokens:
+                print(f"Prompt prefix (~{prefix_tokens} tokens) is below the {min_tokens}-token context cache "
+                      f"minimum of {model_name}, sending it inline")
+                self._unsupported.add(model_name)
+                return None
+            try:
+                from google.genai import types
+                cache = client.caches.create(model=model_name, config=types.CreateCachedContentConfig(
+                    system_instruction=self.system_instruction, ttl=f"{self.ttl}s",
+                    display_name=f"news-to-map-prompt-v{PROMPT_VERSION}"))
+            except Exception as e:
+                print(f"Context caching unavailable for {model_name}, sending the prompt prefix inline: {e}")
+                self._unsupported.add(model_name)
+                return None
+            # refresh a minute early so no call uses an entry that expires mid-request
+            self._entries[model_name] = (cache.name, time.monotonic() + max(0, self.ttl - 60))
+            return cache.name
+
+    def invalidate(self, model_name: str) -> None:
+        """Forget the entry of `model_name`, e.g. after the API rejected it; the next call recreates it."""
+        with self._lock:
+            self._entries.pop(model_name, None)
+
+
+def min_cache_tokens(model_name: str) -> int:
+    """Minimum number of tokens of an explicit context cache for `model_name`."""
+    matches = [prefix for prefix in MIN_CACHE_TOKENS if model_name.startswith(prefix)]
+    if not matches:
+        return max(MIN_CACHE_TOKENS.values())
+    return MIN_CACHE_TOKENS[max(matches, key=len)]
+
+
+def _is_cache_rejection(exc: BaseException) -> bool:
+    # the API's answer to a missing, expired or invalid `cached_content`; quota (429),
+    # server and network errors are not, and go to the retry policy instead
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return code in (400, 403, 404) and "cache" in str(exc).lower()
+
+
+def validate_locations(data: Any) -> Tuple[Dict[str, List[str]], List[str]]:
+    """
+    Validate and normalize a parsed model response in a single pass.
+
+    Checks that `data` is a dict with exactly the six expected keys, each a list
+    of the same length, and normalizes missing values (None, null, "", "N/A", ...)
+    to the string "None" that `geocode_nominatim` expects.
 
     Returns
     -------
-    Dict[str, List[str]]
-        A dictionary with keys 'cities', 'states_provinces', 'countries',
-        'landmarks', and 'regions', each mapping to a list of strings
-        (possibly empty) extracted from the text.
+    Tuple[Dict[str, List[str]], List[str]]
+        The normalized locations dict ({} when there are no locations) and a list
+        of problems found. The dict is only meaningful when the list is empty.
     """
-    locations = {
-        "cities": [],
-        "states_provinces": [],
-        "countries": [],
-        "landmarks": [],
-        "regions": []
-    }
-    
-    # Simple pattern matching as fallback
-    lines = text.split('\n')
-    current_category = None
-    
-    for line in lines:
-        line = line.strip()
-        if 'cities' in line.lower():
-            current_category = 'cities'
-        elif 'states' in line.lower() or 'provinces' in line.lower():
-            current_category = 'states_provinces'
-        elif 'countries' in line.lower():
-            current_category = 'countries'
-        elif 'landmarks' in line.lower():
-            current_category = 'landmarks'
-        elif 'regions' in line.lower():
-            current_category = 'regions'
-        elif current_category and line:
-            # Extract location names from line
-            items = re.findall(r'[A-Z][a-zA-Z\s]+', line)
-            locations[current_category].extend(items)
-    
-    return locations
+    if not isinstance(data, dict):
+        return {}, [f"expected a JSON object, got {type(data).__name__}"]
+    if not data or all(isinstance(v, list) and not v for v in data.values()):
+        return {}, []
+
+    errors = []
+    missing = [k for k in LOCATION_KEYS if k not in data]
+    extra = [k for k in data if k not in LOCATION_KEYS]
+    if missing:
+        errors.append(f"missing keys: {missing}")
+    if extra:
+        errors.append(f"unexpected keys: {extra}")
+
+    out = {}
+    for k in LOCATION_KEYS:
+        values = data.get(k, [])
+        if not isinstance(values, list):
+            errors.append(f"'{k}' must be a list")
+            values = []
+        out[k] = ["None" if v is None or str(v).strip().lower() in _NONE_VALUES else str(v).strip()
+                  for v in values]
+
+    lengths = {k: len(v) for k, v in out.items()}
+    if len(set(lengths.values())) > 1:
+        errors.append(f"lists must all have the same length, got {lengths}")
+    return out, errors
+
+
+def parse_locations_response(text: str) -> Tuple[Dict[str, List[str]], List[str]]:
+    """Parse raw model text (bare JSON, or JSON embedded in prose) and validate it."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        # Look for JSON in the response
+        json_match = re.search(r'\{.*\}', text, re.DOTALL)
+        if not json_match:
+            return {}, ["no JSON object found in the response"]
+        try:
+            data = json.loads(json_match.group())
+        except json.JSONDecodeError as e:
+            return {}, [f"invalid JSON: {e}"]
+    return validate_locations(data)
+
+
+def repair_locations_response(
+    raw: str,
+    errors: List[str],
+    client: Any,
+    model_name: str,
+    config: Any = None,
+    usage: Optional[Dict[str, int]] = None,
+) -> Tuple[Dict[str, List[str]], List[str]]:
+    """
+    Ask the model to fix an invalid response. The repair prompt only contains
+    the broken output and the problems found, not the article, so it is much
+    cheaper than re-running the extraction.
+    """
+    prompt = (
+        "The following JSON was meant to list locations as parallel lists under the keys "
+        f"{LOCATION_KEYS}, all lists having the same length and using \"None\" for missing values. "
+        f"It has these problems: {'; '.join(errors)}.\n"
+        "Return only the corrected JSON, changing as little as possible.\n\n"
+        f"{raw}"
+    )
+    with get_metrics().timer("llm_request_seconds", model=model_name):
+        response = client.models.generate_content(model=model_name, contents=prompt, config=config)
+    record_usage(usage, response)
+    return parse_locations_response(response.text or "")
     
                 
 def extract_locations_with_gemini(
     text: str,
     client: Any,
     model_name: str,
-    test_mode: bool = False
+    test_mode: bool = False,
+    max_chars: int = 10000,
+    structured_output: bool = True,
+    retry_policy: Optional[RetryPolicy] = None,
+    usage: Optional[Dict[str, int]] = None,
+    prefix_cache: Optional[PromptPrefixCache] = None,
+    raise_on_failure: bool = False,
 ) -> Dict[str, List[str]]:
     """
     Use a Gemini client to extract and categorize locations mentioned in text.
-    Sends a structured prompt to `client.models.generate_content(...)` asking for
-    JSON with structured parallel lists (equal length across keys).
+    Sends the article to `client.models.generate_content(...)` with the static
+    `SYSTEM_INSTRUCTION` (instructions and few-shot examples), asking for JSON
+    with structured parallel lists (equal length across keys).
 
     Parameters
     ----------
@@ -81,6 +278,30 @@ def extract_locations_with_gemini(
         The name of the Gemini model to call.
     test_mode : bool, optional
         If True, prints the raw input for debugging, by default False.
+    max_chars : int, optional
+        The text is truncated to this many characters, by default 10000.
+        Use `extract_locations_chunked` to cover longer articles.
+    structured_output : bool, optional
+        If True, request `application/json` output constrained to
+        `LOCATION_RESPONSE_SCHEMA`, by default True. In both modes the response is
+        checked by `validate_locations`; an invalid response gets one targeted
+        repair call before the whole extraction is retried.
+    retry_policy : RetryPolicy, optional
+        Backoff, error classification and overall deadline for the call. Each
+        attempt's HTTP timeout is bounded by the time left before the deadline.
+        By default a fresh `RetryPolicy()`.
+    usage : dict, optional
+        If given, the "input_tokens" and "output_tokens" of every call made
+        (retries and repairs included) are added to it, together with the
+        "cached_tokens" served from a context cache, by default None.
+    prefix_cache : PromptPrefixCache, optional
+        Holds the static prompt prefix in a provider-side context cache instead
+        of sending it with every call, by default None (`SYSTEM_INSTRUCTION`
+        sent as system instruction). Its `system_instruction` is the prefix used.
+    raise_on_failure : bool, optional
+        Raise `ExtractionFailed` when all attempts failed instead of returning {},
+        so callers can tell a failure from an article without locations (e.g. to
+        keep it out of a result cache), by default False.
 
     Returns
     -------
@@ -92,126 +313,228 @@ def extract_locations_with_gemini(
             - "countries"
             - "landmarks"
             - "summary" (one short reason per location)
-        , each mapping to a list of strings.
-        On failures in upstream calls, the implementation may return an empty
-        dict or a best-effort parsed structure.
+        , each mapping to a list of strings of equal length.
+        Returns an empty dict if there are no locations or, unless
+        `raise_on_failure`, all attempts failed.
     """
 
     if test_mode:
         print(f"\n{'#'*20}text input to gemini: {text}\n{'#'*20}")
-    # Craft a detailed prompt for location extraction
-    prompt = f"""
-    Please analyze the following news article and extract ALL real-world locations mentioned, as well as a very concise summary of why this location is mentioned in the article.
-    
-    For each location found, categorize it as:
-    - Cities
-    - provinces/counties 
-    - States
-    - Countries
-    - Landmarks
-    - Summary of why location is mentioned
-    
-    Return the results in valid JSON format like this:
-    {{
-        "cities": ["City1", "City2"],
-        "provinces_counties": ["Province1","Province2"],
-        "states": ["State1","State2"],
-        "countries": ["Country1", "Country2"],
-        "landmarks": ["Landmark1","Landmark2"],
-        "summary": ["Summary1","Summary2"]
-    }}
-    
-    Only include actual geographical locations, not fictional places or organization names.
-    Avoid duplicates and be comprehensive.
+    from google.genai import types
 
-    Make sure that each json entry (cities, provinces_counties, etc.) is a list with the same number of items across categories. 
-    i.e. if there are 3 cities, there should be 3 provinces_counties, 3 countries, 3 summaries etc. 
-    If a category does not apply or is not found, use your knowledge to determine the most appropriate response, and return "None" if there is any doubt. 
-    Make sure that the provided response makes sense, i.e. the city of San Jose should not be associated with the county of Alameda or San Mateo, but Santa Clara.
-    
-    Here are two examples with correct outputs:
-
-    Example 1: article text:
-    The Dixie Fire started on July 13, 2021 in Feather River Canyon southeast of Lassen Volcanic National Park. The fire entered 
-    the southeast corner of the park near Juniper Lake on August 5, 2021 at which point Lassen Volcanic National Park entered into 
-    unified command with USFS and CAL FIRE to implement a full suppression strategy.
-    The Dixie Fire reached its final size of 73,240 acres within the park on September 30. On October 26, the Dixie Fire reached 100% 
-    containment with a total size of 963,309 acres making it the largest single fire in California history.
-
-    Example 1: valid Json response for the example 1 article text:
-    {{
-        "cities": ["None", "None", "None"],
-        "provinces_counties": ["Lassen","Lassen","Lassen"],
-        "states": ["California","California","California"],
-        "countries": ["USA", "USA", "USA"],
-        "landmarks": ["Feather River Canyon", "Lassen Volcanic National Park", "Juniper Lake"],
-        "summary": ["Dixie Fire ignition point (July 13, 2021)", "Major impact area. Dixie Fire entered Aug 5 and burned 73,240 acres inside the park.", "Entry point where the fire crossed into the park"]
-    }}
-
-    Example 2: article text:
-    The Eras Tour by the numbers:
-    Swift performed 149 shows between March 2023 and December 2024. The tour traveled to 51 cities across 21 countries. A typical Eras show featured 44-46 songs and ran for 3 hours and 15 minutes.
-    and ran for 3 hours and 15 minutes. Swift spent a total of roughly 25 hours performing her 10-minute version of "All Too Well." A total of 10,168,008 people purchased $2,077,618,725 in tickets — averaging about $204 per seat, Swift's company told the NYT.
-    Eighteen opening acts warmed up the crowd for Swift, including Sabrina Carpenter, Paramore and Phoebe Bridgers. Fifteen special guests, mostly musicians, joined her onstage in occasional surprise appearances.
-    Swift wore more than 60 outfits throughout the tour and more than 250 custom pairs of shoes by designer Christian Louboutin. Swift's biggest crowd (of both the tour and her entire career) was 96,000 people at the Melbourne Cricket Ground in Australia in February.
-    In July 2023, Seattle fans danced so hard that they created the seismic equivalent of a 2.3 magnitude earthquake.
-
-    Example 2: valid Json response for the example 2 article text:
-    {{
-        "cities": ["Melbourne", "Seattle"],
-        "provinces_counties": ["None","King"],
-        "states": ["Victoria","Washington"],
-        "countries": ["Australia", "USA"],
-        "landmarks": ["Melbourne Cricket Ground", "None"],
-        "summary": ["Hosted Swift’s biggest crowd ever: 96,000 people (February).", "Fans’ dancing created a seismic event equivalent to magnitude 2.3 (July 2023)."]
-    }}
-
-    Example 3: article text:
-    Scientists have long known that the brain’s visual system isn’t fully hardwired from the start — it becomes refined by what babies see — but the authors of a new study still weren’t prepared for the degree of rewiring they observed when they took a first-ever look at the process in mice as it happened in real-time.
-    As the researchers tracked hundreds of “spine” structures housing individual network connections, or “synapses,” on the dendrite branches of neurons in the visual cortex over 10 days, they saw that only 40 percent of the ones that started the process survived. Refining binocular vision (integrating input from both eyes) required numerous additions and removals of spines along the dendrites to establish an eventual set of connections.
-    Former graduate student Katya Tsimring led the study, published this month in Nature Communications, which the team says is the first in which scientists tracked the same connections all the way through the “critical period,” when binocular vision becomes refined.
-    “What Katya was able to do is to image the same dendrites on the same neurons repeatedly over 10 days in the same live mouse through a critical period of development, to ask, what happens to the synapses or spines on them?,” says senior author Mriganka Sur. “We were surprised by how much change there is.”
-
-    Example 3: valid Json response for the example 3 article text:
-    {{}}
-
-    Article text:
-    {text[:10000]}  # Limit text length for API limits
-    """
-    
-    for attempt in range(1, 4):  # retry up to 3 times
+    prompt = f"Article text:\n{text[:max_chars]}"
+    config = types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=LOCATION_RESPONSE_SCHEMA,
+    ) if structured_output else types.GenerateContentConfig()
+    # the static instructions go once into a provider-side cache when possible, else as system instruction
+    cache_name = prefix_cache.get(client, model_name) if prefix_cache is not None else None
+    # the repair prompt stands on its own, without the extraction instructions
+    repair_config = config
+    instruction = prefix_cache.system_instruction if prefix_cache is not None else SYSTEM_INSTRUCTION
+    inline_config = config.model_copy(update={"system_instruction": instruction})
+    config = config.model_copy(update={"cached_content": cache_name}) if cache_name else inline_config
+
+    retry_policy = retry_policy or RetryPolicy()
+
+    def _attempt():
+        nonlocal config
+        call_config, fix_config = config, repair_config
+        remaining = retry_policy.remaining()
+        if remaining is not None:
+            # never let a single request outlive the call's deadline
+            http_options = types.HttpOptions(timeout=max(1000, int(remaining * 1000)))
+            call_config = config.model_copy(update={"http_options": http_options})
+            fix_config = repair_config.model_copy(update={"http_options": http_options})
         try:
-            response = client.models.generate_content(model=model_name, contents=prompt)
-            gen_result = response.text
-            if not gen_result or str(gen_result).strip().lower() == "none":  # ADDED: treat empty/None as failure
-                raise ValueError("Gemini returned empty response.text")
-            if test_mode:
-                print(f"\n{'#'*20}\nresults from gemini:\n{gen_result}\n{'#'*20}")
-            
-            # Try to extract JSON from the response
-            try:
-                # Look for JSON in the response
-                json_match = re.search(r'\{.*\}', gen_result, re.DOTALL)
-                if json_match:
-                    locations_data = json.loads(json_match.group())
-                    return locations_data
-                else:
-                    # Fallback: parse the response manually
-                    return parse_fallback_response(gen_result)
-                    
-            except json.JSONDecodeError:
-                return parse_fallback_response(gen_result)
-                
+            with get_metrics().timer("llm_request_seconds", model=model_name):
+                response = client.models.generate_content(model=model_name, contents=prompt, config=call_config)
         except Exception as e:
-            print(f"Attempt {attempt}/3 failed: {e}")  # log attempt
-            if attempt < 3:                             # wait then retry
-                time.sleep(3)
-                continue
-            else:
-                return {}     
+            if not call_config.cached_content or not _is_cache_rejection(e):
+                raise
+            # expired, deleted or invalid cache entry: go on with the prefix inline
+            print(f"Cached prompt prefix rejected, sending it inline: {e}")
+            prefix_cache.invalidate(model_name)
+            config = inline_config
+            call_config = call_config.model_copy(update={"cached_content": None,
+                                                         "system_instruction": instruction})
+            with get_metrics().timer("llm_request_seconds", model=model_name):
+                response = client.models.generate_content(model=model_name, contents=prompt, config=call_config)
+        record_usage(usage, response)
+        gen_result = response.text
+        if not gen_result or str(gen_result).strip().lower() == "none":  # ADDED: treat empty/None as failure
+            raise ValueError("Gemini returned empty response.text")
+        if test_mode:
+            print(f"\n{'#'*20}\nresults from gemini:\n{gen_result}\n{'#'*20}")
+
+        locations_data, errors = parse_locations_response(gen_result)
+        if errors:
+            if test_mode:
+                print(f"Invalid response ({'; '.join(errors)}), asking for a repair")
+            locations_data, errors = repair_locations_response(gen_result, errors, client, model_name, fix_config, usage)
+        if errors:
+            raise ValueError(f"Unparseable Gemini response: {'; '.join(errors)}")
+        return locations_data
+
+    try:
+        return retry_policy.run(_attempt)
+    except Exception as e:
+        print(f"Gemini extraction failed: {e}")
+        if raise_on_failure:
+            raise ExtractionFailed(str(e)) from e
+        return {}
     
 
+def split_text_chunks(text: str, max_chars: int, overlap_chars: int = 0) -> List[str]:
+    """
+    Split `text` into chunks of at most `max_chars` characters, preferring to
+    cut at paragraph or sentence boundaries. Consecutive chunks overlap by about
+    `overlap_chars` so a location mentioned across a cut is seen whole at least once.
+
+    Raises
+    ------
+    ValueError
+        If `overlap_chars` is negative or at least half of `max_chars`: a chunk
+        may end in the second half of its window, so a larger overlap would
+        advance a few characters at a time and multiply the number of chunks.
+    """
+    if max_chars <= 0:
+        raise ValueError(f"max_chars must be positive, got {max_chars}")
+    if not 0 <= overlap_chars < max_chars // 2:
+        raise ValueError(f"overlap_chars must be between 0 and half of max_chars ({max_chars // 2}), "
+                         f"got {overlap_chars}")
+    if len(text) <= max_chars:
+        return [text]
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # cut at the last paragraph break, else sentence end, in the second half of the window
+            window = text[start + max_chars // 2:end]
+            for sep in ("\n\n", "\n", ". ", " "):
+                cut = window.rfind(sep)
+                if cut != -1:
+                    end = start + max_chars // 2 + cut + len(sep)
+                    break
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap_chars, start + 1)
+        # do not restart in the middle of a word
+        space = text.find(" ", start, end)
+        if overlap_chars and space != -1:
+            start = space + 1
+    return [c for c in chunks if c]
+
+
+def merge_location_dicts(parts: List[Dict[str, List[str]]]) -> Dict[str, List[str]]:
+    """
+    Merge several six-key parallel-list dicts into one, dropping repeated
+    locations (same city/county/state/country/landmark, case-insensitive).
+    The first summary seen for a location is kept. Returns {} if nothing is left.
+    """
+    merged = {k: [] for k in LOCATION_KEYS}
+    seen = set()
+    for part in parts:
+        if not part or any(k not in part for k in LOCATION_KEYS):
+            continue
+        n = len(part["summary"])
+        if any(len(part[k]) != n for k in LOCATION_KEYS):
+            continue
+        for i in range(n):
+            key = tuple(str(part[k][i]).strip().lower() for k in LOCATION_KEYS if k != "summary")
+            if key in seen:
+                continue
+            seen.add(key)
+            for k in LOCATION_KEYS:
+                merged[k].append(part[k][i])
+    return merged if merged["summary"] else {}
+
+
+def extract_locations_chunked(
+    text: str,
+    client: Any,
+    model_name: str,
+    chunk_tokens: int = 2500,
+    overlap_tokens: Optional[int] = None,
+    max_concurrency: int = 4,
+    test_mode: bool = False,
+    retry_policy: Optional[RetryPolicy] = None,
+    usage: Optional[Dict[str, int]] = None,
+    prefix_cache: Optional[PromptPrefixCache] = None,
+) -> Dict[str, List[str]]:
+    """
+    Extract locations from an article of any length with a map-reduce over chunks.
+
+    The text is split into overlapping chunks of about `chunk_tokens` tokens,
+    each chunk is sent to `extract_locations_with_gemini` concurrently, and the
+    per-chunk results are merged and deduplicated into the same six-key schema.
+    Nothing is truncated, and latency depends on the chunk size rather than the
+    article length.
+
+    Parameters
+    ----------
+    text : str
+        The article to analyze.
+    client : Any
+        A Gemini client instance exposing `models.generate_content(...)`.
+    model_name : str
+        The name of the Gemini model to call.
+    chunk_tokens : int, optional
+        Approximate token budget of the article text in each prompt, by default 2500.
+    overlap_tokens : int, optional
+        Approximate overlap between consecutive chunks, less than half of
+        `chunk_tokens`, by default `CHUNK_OVERLAP_FRACTION` of it (100 for 2500).
+    max_concurrency : int, optional
+        Maximum number of chunks sent to the model at the same time, by default 4.
+    test_mode : bool, optional
+        If True, prints debugging information, by default False.
+    retry_policy : RetryPolicy, optional
+        Retry policy applied to each chunk's call, by default None (a fresh policy per call).
+    usage : dict, optional
+        Token counter shared by all chunk calls, see `extract_locations_with_gemini`.
+    prefix_cache : PromptPrefixCache, optional
+        Context cache of the static prompt prefix, see `extract_locations_with_gemini`.
+
+    Returns
+    -------
+    Dict[str, List[str]]
+        Same schema as `extract_locations_with_gemini`; {} if no chunk found any location.
+
+    Raises
+    ------
+    ExtractionFailed
+        If the call for any chunk failed: a merge of the other chunks would be
+        an incomplete result that looks like a complete one.
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    if overlap_tokens is None:
+        overlap_tokens = int(chunk_tokens * CHUNK_OVERLAP_FRACTION)
+    chunks = split_text_chunks(text, max_chars, overlap_tokens * CHARS_PER_TOKEN)
+    if test_mode:
+        print(f"Article split into {len(chunks)} chunk(s) of <= {max_chars} characters")
+
+    def _extract_chunk(chunk):
+        return extract_locations_with_gemini(chunk, client, model_name, test_mode=test_mode,
+                                             max_chars=max_chars, retry_policy=retry_policy, usage=usage,
+                                             prefix_cache=prefix_cache, raise_on_failure=True)
+
+    if len(chunks) == 1:
+        return _extract_chunk(chunks[0])
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(chunks)))) as pool:
+        futures = [pool.submit(_extract_chunk, chunk) for chunk in chunks]
+        failed = [f.exception() for f in futures if f.exception() is not None]
+    if failed:
+        raise ExtractionFailed(f"{len(failed)} of {len(chunks)} chunks failed: {failed[0]}") from failed[0]
+    return merge_location_dicts([f.result() for f in futures])
+
+
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from google import genai
+
+    load_dotenv()  # load environment variables from .env file
     text = input("Enter text to analyze: ").strip()
     api_key = os.environ.get("GEMINI_API_KEY")
     client = genai.Client(api_key=api_key)
@@ -0,0 +1,133 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from gazetteer import LocalGazetteer, fold_name, CITY
+
+# Phrases typical of bot walls, paywalls and error pages. Only checked on short
+# pages, since a real article may well mention e.g. a "captcha".
+BLOCK_PATTERNS = re.compile(
+    r"403 forbidden|access denied|are you a robot|verify you are (a )?human|enable javascript"
+    r"|captcha|subscribe to (continue|read)|subscribers only|log in to continue reading"
+    r"|this content is (only )?available to subscribers|page not found|404 not found",
+    re.IGNORECASE,
+)
+BLOCK_PAGE_MAX_CHARS = 1500
+
+# Capitalized words that start a span but are rarely places
+NON_PLACE_WORDS = {
+    "The", "A", "An", "This", "That", "These", "Those", "It", "He", "She", "They", "We", "I", "You",
+    "But", "And", "Or", "If", "When", "While", "As", "In", "On", "At", "For", "From", "With", "By",
+    "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday",
+    "January", "February", "March", "April", "May", "June", "July", "August", "September",
+    "October", "November", "December", "Mr", "Mrs", "Ms", "Dr", "Former", "Senior",
+}
+# Words that mark a capitalized span as an organization or publication, not a place
+ORG_WORDS = {
+    "Nature", "Science", "Cell", "Journal", "Communications", "Proceedings", "Review", "Times",
+    "Post", "News", "Magazine", "Press", "University", "Institute", "College", "Committee",
+    "Department", "Association", "Company", "Inc", "Corp", "Group", "Foundation", "Council",
+}
+PLACE_CUES = re.compile(
+    r"\b(?:in|at|near|from|to|across|outside|inside|around|toward|towards|throughout)\s+"
+    r"((?:[A-Z][\w’'-]+)(?:\s+(?:of\s+|de\s+|the\s+)?[A-Z][\w’'-]+){0,3})"
+)
+PLACE_WORDS = re.compile(
+    r"\b[A-Z][\w’'-]+\s+(?:City|County|River|Lake|Mountains?|Valley|Island|Province|State|Bay|Park|Street|Avenue)\b"
+)
+CAPITALIZED_SPAN = re.compile(r"\b[A-Z][\w’'-]+(?:\s+[A-Z][\w’'-]+){0,3}")
+
+
+@dataclass
+class PrefilterResult:
+    """Decision of `prefilter_article`. `blocked` distinguishes bot/paywall pages from location-free articles."""
+    passed: bool
+    reason: str = ""
+    blocked: bool = False
+    candidates: List[str] = field(default_factory=list)
+
+
+def find_place_candidates(text: str, gazetteer: Optional[LocalGazetteer] = None,
+                          min_population: int = 1000, limit: int = 20) -> List[str]:
+    """
+    Cheap scan for strings that look like place names.
+
+    With a `LocalGazetteer`, capitalized spans (and their sub-spans) are looked
+    up among countries, admin regions and cities of at least `min_population`.
+    Without one, spans following a locative preposition ("in Seattle", "near
+    Juniper Lake") or ending in a geographic word ("Feather River") are counted.
+    """
+    found: List[str] = []
+    if gazetteer is not None:
+        for m in CAPITALIZED_SPAN.finditer(text):
+            words = m.group().split()
+            # try the longest sub-spans first: "Lassen Volcanic National Park" before "Lassen"
+            for size in range(len(words), 0, -1):
+                for start in range(len(words) - size + 1):
+                    span = " ".join(words[start:start + size])
+                    if span in NON_PLACE_WORDS or ORG_WORDS.intersection(span.split()):
+                        continue
+                    folded = fold_name(span)
+                    if (folded in gazetteer.country_lookup or folded in gazetteer.admin1_lookup
+                            or any(gazetteer.kind[f] != CITY or gazetteer.population[f] >= min_population
+                                   for f in gazetteer.index.get(folded, ()))):
+                        found.append(span)
+                        if len(found) >= limit:
+                            return found
+        return found
+
+    for pattern in (PLACE_CUES, PLACE_WORDS):
+        for m in pattern.finditer(text):
+            span = m.group(1) if pattern is PLACE_CUES else m.group()
+            words = span.split()
+            if words[0] not in NON_PLACE_WORDS and not ORG_WORDS.intersection(words):
+                found.append(span)
+                if len(found) >= limit:
+                    return found
+    return found
+
+
+def prefilter_article(text: str, status_code: Optional[int] = None,
+                      gazetteer: Optional[LocalGazetteer] = None, fetched: Optional[bool] = None) -> PrefilterResult:
+    """
+    Decide in milliseconds whether an article is worth an LLM extraction call.
+
+    Rejects, in order: HTTP error responses, empty pages, short fetched pages
+    matching bot-wall/paywall/error patterns (pasted text may well quote
+    "access denied" or "captcha") and, only when a gazetteer is given,
+    articles in which `find_place_candidates` finds no known place name (e.g.
+    science or opinion pieces). Without a gazetteer the cue-based scan misses
+    ordinary ledes ("Tokyo stocks fell...", "PARIS - French lawmakers..."), so
+    its candidates are reported but never reject an article.
+
+    Parameters
+    ----------
+    text : str
+        Extracted article text.
+    status_code : int, optional
+        HTTP status of the page the text came from, if fetched from a URL.
+    gazetteer : LocalGazetteer, optional
+        Enables the gazetteer-based place scan and the "no place names" rejection.
+    fetched : bool, optional
+        Whether the text was extracted from a downloaded page, which enables
+        the block-page check. By default, whether a `status_code` is given.
+
+    Returns
+    -------
+    PrefilterResult
+    """
+    if status_code is not None and status_code >= 400:
+        return PrefilterResult(False, f"HTTP {status_code} response", blocked=True)
+    if not text or not text.strip():
+        return PrefilterResult(False, "empty article text", blocked=True)
+    if fetched is None:
+        fetched = status_code is not None
+    if fetched and len(text) < BLOCK_PAGE_MAX_CHARS:
+        m = BLOCK_PATTERNS.search(text)
+        if m:
+            return PrefilterResult(False, f"page looks blocked or paywalled ({m.group()!r})", blocked=True)
+
+    candidates = find_place_candidates(text, gazetteer)
+    if not candidates and gazetteer is not None:
+        return PrefilterResult(False, "no plausible place names found")
+    return PrefilterResult(True, candidates=candidates)
@@ -0,0 +1,122 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from instrumentation import get_metrics
+
+PUBLIC_NOMINATIM_DOMAIN = "nominatim.openstreetmap.org"
+
+
+@dataclass
+class RatePolicy:
+    """
+    Request budget for one geocoding endpoint.
+
+    Attributes
+    ----------
+    rate : float
+        Sustained requests per second (token bucket refill rate).
+    burst : int
+        Bucket capacity, i.e. how many requests may go out back-to-back.
+    max_in_flight : int
+        Maximum number of concurrent requests. Also the natural number of
+        worker threads for `geocode_nominatim`.
+    """
+    rate: float = 1.0
+    burst: int = 1
+    max_in_flight: int = 1
+
+    @classmethod
+    def for_endpoint(cls, domain: str) -> "RatePolicy":
+        """Default policy: the public OSM server allows 1 request/second, no parallelism."""
+        if domain == PUBLIC_NOMINATIM_DOMAIN:
+            return cls(rate=1.0, burst=1, max_in_flight=1)
+        return cls(rate=50.0, burst=10, max_in_flight=8)
+
+
+class TokenBucket:
+    """Thread-safe token bucket. `acquire` blocks until a token is available and returns the time slept."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        slept = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return slept
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            slept += wait
+
+
+class RateLimitedGeocoder:
+    """
+    Drop-in replacement for geopy's `RateLimiter` that applies a `RatePolicy`
+    and can be called from several threads at once.
+
+    Each call waits for a token from the bucket and a free in-flight slot.
+    Like `RateLimiter(swallow_exceptions=True)`, failed calls are retried
+    `max_retries` times and then return None instead of raising.
+
+    Parameters
+    ----------
+    func : Callable
+        The geocoding function, e.g. `Nominatim(...).geocode`.
+    policy : RatePolicy
+        Rate and concurrency budget of the endpoint behind `func`.
+    max_retries : int, optional
+        Retries after an exception, by default 2.
+    error_wait_seconds : float, optional
+        Pause before each retry, by default 5.0.
+    swallow_exceptions : bool, optional
+        Return None instead of raising after the last retry, by default True.
+        Use False in front of `geocode_nominatim`, which would otherwise
+        remember the None of a failed request as a miss.
+    """
+
+    def __init__(self, func: Callable[..., Any], policy: RatePolicy, max_retries: int = 2,
+                 error_wait_seconds: float = 5.0, swallow_exceptions: bool = True):
+        self.func = func
+        self.policy = policy
+        self.max_retries = max_retries
+        self.error_wait_seconds = error_wait_seconds
+        self.swallow_exceptions = swallow_exceptions
+        self.calls = 0
+        self.sleep_seconds = 0.0
+        self._bucket = TokenBucket(policy.rate, policy.burst)
+        self._slots = threading.BoundedSemaphore(max(1, policy.max_in_flight))
+        self._stats_lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs) -> Optional[Any]:
+        for attempt in range(self.max_retries + 1):
+            with self._slots:
+                slept = self._bucket.acquire()
+                with self._stats_lock:
+                    self.calls += 1
+                    self.sleep_seconds += slept
+                metrics = get_metrics()
+                metrics.inc("geocode_requests_total")
+                if slept:
+                    metrics.inc("rate_limit_sleep_seconds_total", slept)
+                try:
+                    return self.func(*args, **kwargs)
+                except Exception:
+                    if attempt == self.max_retries:
+                        if self.swallow_exceptions:
+                            return None
+                        raise
+            time.sleep(self.error_wait_seconds)
+            with self._stats_lock:
+                self.sleep_seconds += self.error_wait_seconds
+            get_metrics().inc("rate_limit_sleep_seconds_total", self.error_wait_seconds)
@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from instrumentation import get_metrics
+
+# error categories returned by `RetryPolicy.classify`
+RATE_LIMIT, SERVER, NETWORK, PARSE, CLIENT, OTHER = "rate_limit", "server", "network", "parse", "client", "other"
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+@dataclass
+class RetryStats:
+    """What happened during one call made through a `RetryPolicy`."""
+    attempts: int = 0
+    backoff_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)  # category of each failed attempt
+    succeeded: bool = False
+
+
+class RetryPolicy:
+    """
+    Retry policy for LLM calls: exponential backoff with jitter, error
+    classification and an overall deadline per call.
+
+    The delay before attempt n+1 is `base_delay * multiplier**(n-1)`, capped at
+    `max_delay`, raised to at least `rate_limit_delay` after a quota error (429),
+    and then reduced by a random fraction up to `jitter` so that concurrent
+    workers do not retry in lockstep. Client errors (4xx other than 429) are not
+    retried. A call never sleeps past its `deadline`.
+
+    Every call's `RetryStats` is appended to `history` (bounded), and `summary()`
+    aggregates attempts and backoff time, e.g. to size batch throughput against quota.
+
+    Parameters
+    ----------
+    max_attempts : int, optional
+        Attempts per call including the first one, by default 4.
+    base_delay, max_delay, multiplier : float, optional
+        Exponential backoff parameters in seconds, by default 1.0, 30.0 and 2.0.
+    jitter : float, optional
+        Fraction of the delay that is randomized, between 0 and 1, by default 0.5.
+    rate_limit_delay : float, optional
+        Minimum wait after a 429 / RESOURCE_EXHAUSTED error, by default 10.0.
+    deadline : float, optional
+        Total seconds allowed per call, including backoff. None for no deadline.
+        By default 120.0.
+    retry_on : tuple of str, optional
+        Error categories that are retried.
+    verbose : bool, optional
+        Print a line for each failed attempt, by default True.
+    """
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 multiplier: float = 2.0, jitter: float = 0.5, rate_limit_delay: float = 10.0,
+                 deadline: Optional[float] = 120.0,
+                 retry_on: Tuple[str, ...] = (RATE_LIMIT, SERVER, NETWORK, PARSE, OTHER),
+                 verbose: bool = True, history_size: int = 1000):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.rate_limit_delay = rate_limit_delay
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self.verbose = verbose
+        self.history: deque = deque(maxlen=history_size)
+        self._local = threading.local()
+
+    @staticmethod
+    def classify(exc: BaseException) -> str:
+        """Map an exception to one of the error categories."""
+        code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+        status = str(getattr(exc, "status", "") or "")
+        if code == 429 or "RESOURCE_EXHAUSTED" in status or "429" in str(exc)[:20]:
+            return RATE_LIMIT
+        if isinstance(code, int) and 500 <= code < 600 or status in ("UNAVAILABLE", "INTERNAL", "DEADLINE_EXCEEDED"):
+            return SERVER
+        if isinstance(code, int) and 400 <= code < 500:
+            return CLIENT
+        if isinstance(exc, (TimeoutError, ConnectionError)) or any(
+                s in type(exc).__name__ for s in ("Timeout", "Connect", "Network")):
+            return NETWORK
+        if isinstance(exc, ValueError):  # includes json.JSONDecodeError and invalid responses
+            return PARSE
+        return OTHER
+
+    def backoff(self, attempt: int, category: str) -> float:
+        """Delay in seconds before the attempt following failed attempt number `attempt`."""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        if category == RATE_LIMIT:
+            delay = max(delay, self.rate_limit_delay)
+        return delay * (1 - self.jitter * random.random())
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline of the call running in this thread (None if unbounded)."""
+        start = getattr(self._local, "start", None)
+        if self.deadline is None or start is None:
+            return None
+        return max(0.0, self.deadline - (time.monotonic() - start))
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call `fn(*args, **kwargs)` under this policy; re-raise the last error when giving up."""
+        stats = RetryStats()
+        start = self._local.start = time.monotonic()
+        try:
+            while True:
+                stats.attempts += 1
+                try:
+                    result = fn(*args, **kwargs)
+                    stats.succeeded = True
+                    return result
+                except Exception as e:
+                    category = self.classify(e)
+                    stats.errors.append(category)
+                    get_metrics().inc("retries_total", category=category)
+                    delay = self.backoff(stats.attempts, category)
+                    elapsed = time.monotonic() - start
+                    out_of_time = self.deadline is not None and elapsed + delay >= self.deadline
+                    give_up = (category not in self.retry_on or stats.attempts >= self.max_attempts
+                               or out_of_time)
+                    if self.verbose:
+                        print(f"Attempt {stats.attempts}/{self.max_attempts} failed ({category}): {e}"
+                              + ("" if give_up else f" - retrying in {delay:.1f}s"))
+                    if give_up:
+                        if out_of_time and category in self.retry_on and stats.attempts < self.max_attempts:
+                            raise DeadlineExceeded(f"Retry deadline of {self.deadline}s exceeded") from e
+                        raise
+                    time.sleep(delay)
+                    stats.backoff_seconds += delay
+                    get_metrics().inc("retry_backoff_seconds_total", delay)
+        finally:
+            stats.elapsed_seconds = time.monotonic() - start
+            self._local.start = None
+            self.history.append(stats)
+
+    @property
+    def last_stats(self) -> Optional[RetryStats]:
+        return self.history[-1] if self.history else None
+
+    def summary(self) -> Dict[str, float]:
+        """Aggregate counters over `history`."""
+        calls = list(self.history)
+        errors: Dict[str, int] = {}
+        for s in calls:
+            for c in s.errors:
+                errors[c] = errors.get(c, 0) + 1
+        return {
+            "calls": len(calls),
+            "failed_calls": sum(not s.succeeded for s in calls),
+            "attempts": sum(s.attempts for s in calls),
+            "backoff_seconds": sum(s.backoff_seconds for s in calls),
+            **{f"errors_{c}": n for c, n in errors.items()},
+        }
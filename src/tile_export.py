@@ -0,0 +1,253 @@
+import json
+import math
+import os
+import struct
+import webbrowser
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Tile file layout (little-endian):
+#   4s   magic b"NTM1"
+#   u32  n, the number of points
+#   f32  lat[n], then f32 lon[n]
+#   u32  byte length of the properties block, then the properties block: UTF-8
+#        JSON list of [map_name, summary, source] per point, in the same order
+TILE_MAGIC = b"NTM1"
+MAX_MERCATOR_LAT = 85.0511
+
+
+def tile_indices(lat, lon, zoom: int):
+    """Web-Mercator (x, y) tile numbers of each point at `zoom`, vectorized."""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(np.asarray(lat, dtype=float), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = np.floor((np.asarray(lon, dtype=float) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(int), np.clip(y, 0, n - 1).astype(int)
+
+
+def encode_tile(df: pd.DataFrame) -> bytes:
+    """Serialize the points of one tile to the binary tile format."""
+    props = json.dumps(list(zip(df['map_name'].astype(str).tolist(), df['summary'].astype(str).tolist(),
+                                df['source'].astype(str).tolist())),
+                       ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"".join([
+        TILE_MAGIC,
+        struct.pack("<I", len(df)),
+        df.lat.to_numpy(dtype="<f4").tobytes(),
+        df.lon.to_numpy(dtype="<f4").tobytes(),
+        struct.pack("<I", len(props)),
+        props,
+    ])
+
+
+def export_tiled_map(locations_data: pd.DataFrame, out_dir: str, tile_zoom: int = 6,
+                     detail_min_zoom: int = 4, overview_zoom: int = 3,
+                     source_column: Optional[str] = "article_input") -> Dict[str, object]:
+    """
+    Export a large set of geocoded locations (e.g. a month of `run_batch`
+    output) as static binary tiles plus a lightweight Leaflet viewer.
+
+    Points are bucketed into Web-Mercator tiles at `tile_zoom` and each
+    non-empty tile is written to `tiles/{x}/{y}.bin` (float32 coordinates and a
+    small JSON block of names/summaries). `index.json` lists the tiles with
+    their point counts, plus a coarse overview at `overview_zoom`. The viewer
+    (`index.html`) shows the overview when zoomed out further than
+    `detail_min_zoom`, and otherwise fetches only the tiles in view, drawing
+    points on a canvas, so opening the map no longer means parsing every marker.
+
+    The viewer loads its files with `fetch`, so serve the folder over HTTP
+    (e.g. `python -m http.server -d <out_dir>`) rather than opening it from disk.
+
+    Parameters
+    ----------
+    locations_data : pd.DataFrame
+        Columns 'lat', 'lon', 'map_name', 'summary'; rows without coordinates are skipped.
+    out_dir : str
+        Output folder, created if missing.
+    tile_zoom : int, optional
+        Zoom level of the data tiles, by default 6.
+    detail_min_zoom : int, optional
+        Lowest map zoom at which individual points are loaded, by default 4.
+    overview_zoom : int, optional
+        Zoom level at which points are aggregated for the overview, by default 3.
+    source_column : str, optional
+        Column shown as the source of each point (a link if it is a URL), by
+        default "article_input" as written by `run_batch`. Ignored if missing.
+
+    Returns
+    -------
+    Dict[str, object]
+        The index written to `index.json`.
+    """
+    df = locations_data.loc[locations_data.lat.notnull() & locations_data.lon.notnull()].copy()
+    df['lat'] = df.lat.astype(float)
+    df['lon'] = df.lon.astype(float)
+    for col in ('map_name', 'summary'):
+        if col not in df:
+            df[col] = ""
+    df['source'] = df[source_column].fillna("") if source_column and source_column in df else ""
+    df['tx'], df['ty'] = tile_indices(df.lat, df.lon, tile_zoom)
+
+    tiles = {}
+    for (tx, ty), tile in df.groupby(['tx', 'ty'], sort=False):
+        path = os.path.join(out_dir, "tiles", str(tx), f"{ty}.bin")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(encode_tile(tile))
+        tiles[f"{tx}/{ty}"] = len(tile)
+
+    ox, oy = tile_indices(df.lat, df.lon, overview_zoom)
+    overview = (df.assign(ox=ox, oy=oy).groupby(['ox', 'oy'])
+                .agg(lat=('lat', 'mean'), lon=('lon', 'mean'), count=('lat', 'size')))
+    index = {
+        "format": TILE_MAGIC.decode(),
+        "tile_zoom": tile_zoom,
+        "detail_min_zoom": detail_min_zoom,
+        "count": int(len(df)),
+        "bounds": ([float(df.lon.min()), float(df.lat.min()), float(df.lon.max()), float(df.lat.max())]
+                   if len(df) else [-180.0, -60.0, 180.0, 75.0]),
+        "tiles": tiles,
+        "overview": [[round(r.lat, 5), round(r.lon, 5), int(r.count)] for r in overview.itertuples()],
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(VIEWER_HTML)
+    return index
+
+
+def serve_tiled_map(out_dir: str, port: int = 8000, open_browser: bool = True) -> None:
+    """Serve an exported map folder over HTTP (blocking) and open the viewer."""
+    import functools
+    from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=os.path.abspath(out_dir))
+    with ThreadingHTTPServer(("127.0.0.1", port), handler) as httpd:
+        url = f"http://127.0.0.1:{port}/index.html"
+        print(f"Serving {out_dir} at {url} (Ctrl+C to stop)")
+        if open_browser:
+            webbrowser.open(url)
+        httpd.serve_forever()
+
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>News → Map</title>
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+(async function () {
+  const index = await (await fetch("index.json")).json();
+  const map = L.map("map", {preferCanvas: true});
+  L.tileLayer("https://tile.openstreetmap.org/{z}/{x}/{y}.png", {
+    maxZoom: 19, attribution: "&copy; OpenStreetMap contributors"
+  }).addTo(map);
+  const b = index.bounds;
+  map.fitBounds([[b[1], b[0]], [b[3], b[2]]]);
+
+  const renderer = L.canvas();
+  const overview = L.layerGroup();
+  const details = L.layerGroup();
+  const loaded = new Map();  // tile key -> Promise of its layer
+
+  for (const [lat, lon, count] of index.overview) {
+    L.circleMarker([lat, lon], {renderer, radius: 4 + 2 * Math.sqrt(count), color: "#d33", weight: 1, fillOpacity: 0.5})
+      .bindTooltip(count + " locations").addTo(overview);
+  }
+
+  function popup(name, summary, source) {
+    const div = document.createElement("div");
+    div.style.width = "200px";
+    const title = document.createElement("h4");
+    title.textContent = name;
+    const text = document.createElement("p");
+    text.textContent = summary;
+    div.append(title, text);
+    if (source) {
+      const src = document.createElement(source.startsWith("http") ? "a" : "small");
+      src.textContent = source.length > 80 ? source.slice(0, 80) + "…" : source;
+      if (source.startsWith("http")) { src.href = source; src.target = "_blank"; }
+      div.append(src);
+    }
+    return div;
+  }
+
+  async function loadTile(key) {
+    const buf = await (await fetch("tiles/" + key + ".bin")).arrayBuffer();
+    const view = new DataView(buf);
+    const n = view.getUint32(4, true);
+    const lat = new Float32Array(buf, 8, n);
+    const lon = new Float32Array(buf, 8 + 4 * n, n);
+    const propsLength = view.getUint32(8 + 8 * n, true);
+    const props = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, 12 + 8 * n, propsLength)));
+    const layer = L.layerGroup();
+    for (let i = 0; i < n; i++) {
+      const [name, summary, source] = props[i];
+      L.circleMarker([lat[i], lon[i]], {renderer, radius: 6, color: "#d33", weight: 1, fillOpacity: 0.8})
+        .bindTooltip(name).bindPopup(() => popup(name, summary, source)).addTo(layer);
+    }
+    return layer;
+  }
+
+  function tileXY(lat, lon, z) {
+    const n = 2 ** z;
+    const r = Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI / 180;
+    const x = Math.floor((lon + 180) / 360 * n);
+    const y = Math.floor((1 - Math.log(Math.tan(r) + 1 / Math.cos(r)) / Math.PI) / 2 * n);
+    return [Math.max(0, Math.min(n - 1, x)), Math.max(0, Math.min(n - 1, y))];
+  }
+
+  function update() {
+    if (map.getZoom() < index.detail_min_zoom) {
+      map.removeLayer(details);
+      overview.addTo(map);
+      return;
+    }
+    map.removeLayer(overview);
+    details.addTo(map);
+    const bounds = map.getBounds();
+    const [x0, y0] = tileXY(bounds.getNorth(), Math.max(-180, bounds.getWest()), index.tile_zoom);
+    const [x1, y1] = tileXY(bounds.getSouth(), Math.min(180, bounds.getEast()), index.tile_zoom);
+    for (let x = x0; x <= x1; x++) {
+      for (let y = y0; y <= y1; y++) {
+        const key = x + "/" + y;
+        if (index.tiles[key] && !loaded.has(key)) {
+          loaded.set(key, loadTile(key).then(layer => { layer.addTo(details); return layer; }));
+        }
+      }
+    }
+  }
+
+  map.on("moveend", update);
+  update();
+})();
+</script>
+</body>
+</html>
+"""
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export geocoded locations (e.g. batch_locations.csv) as a tiled map")
+    parser.add_argument("csv", help="CSV with lat, lon, map_name and summary columns")
+    parser.add_argument("out_dir", help="Output folder")
+    parser.add_argument("--tile-zoom", type=int, default=6)
+    parser.add_argument("--serve", action="store_true", help="Serve the folder and open the viewer")
+    args = parser.parse_args()
+
+    idx = export_tiled_map(pd.read_csv(args.csv), args.out_dir, tile_zoom=args.tile_zoom)
+    print(f"Wrote {idx['count']} locations in {len(idx['tiles'])} tiles to {args.out_dir}")
+    if args.serve:
+        serve_tiled_map(args.out_dir)
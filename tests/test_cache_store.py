@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from cache_store import SingleFlightMemo
+
+
+class StopSession(BaseException):
+    """Stand-in for Streamlit's stop/rerun control-flow exceptions."""
+
+
+def _run_leader_and_follower(leader_compute, follower_compute):
+    memo = SingleFlightMemo()
+    started, release = threading.Event(), threading.Event()
+    outcome = {}
+
+    def leader_body():
+        started.set()
+        release.wait(5)
+        return leader_compute()
+
+    def leader():
+        try:
+            outcome["leader"] = memo.get_or_compute("k", leader_body)
+        except BaseException as e:
+            outcome["leader"] = e
+
+    def follower():
+        try:
+            outcome["follower"] = memo.get_or_compute("k", follower_compute)
+        except BaseException as e:
+            outcome["follower"] = e
+
+    t1 = threading.Thread(target=leader)
+    t1.start()
+    assert started.wait(5)
+    t2 = threading.Thread(target=follower)
+    t2.start()
+    while memo.hits == 0:  # follower has joined the flight
+        pass
+    release.set()
+    t1.join(5)
+    t2.join(5)
+    return memo, outcome
+
+
+def test_follower_shares_ordinary_exception():
+    def fail():
+        raise ValueError("boom")
+
+    _, outcome = _run_leader_and_follower(fail, lambda: pytest.fail("follower must not recompute"))
+    assert isinstance(outcome["leader"], ValueError)
+    assert outcome["follower"] is outcome["leader"]
+
+
+def test_follower_recomputes_after_leader_control_flow_exception():
+    def stop():
+        raise StopSession()
+
+    memo, outcome = _run_leader_and_follower(stop, lambda: "fresh")
+    assert isinstance(outcome["leader"], StopSession)
+    assert outcome["follower"] == "fresh"
+    assert memo.get("k") == "fresh"
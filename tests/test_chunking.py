@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from nlp_loc_extractor import split_text_chunks
+
+ARTICLE = " ".join(f"Sentence {i} mentions Kharkiv and Kyiv." for i in range(700))  # ~26k characters
+
+
+def test_overlap_of_half_a_chunk_or_more_is_rejected():
+    with pytest.raises(ValueError):
+        split_text_chunks(ARTICLE, 400, 400)
+    with pytest.raises(ValueError):
+        split_text_chunks(ARTICLE, 400, 200)
+
+
+def test_chunk_count_stays_proportional_to_length():
+    chunks = split_text_chunks(ARTICLE, 400, 199)
+    assert len(chunks) < 3 * len(ARTICLE) // 400
+    chunks = split_text_chunks(ARTICLE, 10_000, 400)
+    assert 2 <= len(chunks) <= 4
+    assert all(len(c) <= 10_000 for c in chunks)
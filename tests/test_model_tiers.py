@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from model_tiers import ModelTierPolicy
+from nlp_loc_extractor import ExtractionFailed
+
+PARIS = {"cities": ["Paris"], "provinces_counties": ["None"], "states": ["None"], "countries": ["France"],
+         "landmarks": ["None"], "summary": ["Protest in the capital"]}
+
+
+def test_failed_tier_escalates_to_next():
+    calls = []
+
+    def extract(model_name, usage):
+        calls.append(model_name)
+        usage["input_tokens"] += 100
+        if model_name == "gemini-2.5-flash":
+            raise ExtractionFailed("429 RESOURCE_EXHAUSTED")
+        return PARIS
+
+    policy = ModelTierPolicy(["gemini-2.5-flash", "gemini-2.5-pro"], verbose=False)
+    assert policy.run(extract) == PARIS
+    assert calls == ["gemini-2.5-flash", "gemini-2.5-pro"]
+    tiers = policy.summary()["tiers"]
+    assert tiers["gemini-2.5-flash"]["failed"] == 1
+    assert tiers["gemini-2.5-flash"]["escalation_rate"] == 1.0
+    assert tiers["gemini-2.5-flash"]["input_tokens"] == 100
+    assert tiers["gemini-2.5-pro"]["accepted"] == 1
+
+
+def test_last_tier_failure_is_raised():
+    def extract(model_name, usage):
+        raise ExtractionFailed("503 UNAVAILABLE")
+
+    policy = ModelTierPolicy(["gemini-2.5-flash", "gemini-2.5-pro"], verbose=False)
+    with pytest.raises(ExtractionFailed):
+        policy.run(extract)
+    assert policy.summary()["tiers"]["gemini-2.5-pro"]["failed"] == 1
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from prefilter import prefilter_article
+
+LEDES = [
+    "Tokyo stocks fell sharply on Monday as investors sold off exporters after the yen strengthened "
+    "against the dollar, with the Nikkei index closing down 3 percent.",
+    "Ukraine said Russian drones struck Kharkiv overnight, damaging apartment blocks and cutting power "
+    "to thousands of homes, regional officials said on Tuesday.",
+    "PARIS - French lawmakers voted on Wednesday to approve the government's budget after weeks of "
+    "debate, handing the prime minister a narrow victory.",
+    "Brazil and Argentina signed a trade deal on Thursday that cuts tariffs on cars and farm goods, "
+    "the two governments said in a joint statement.",
+    "The Golden Gate Bridge was closed for several hours on Friday after high winds and heavy rain "
+    "swept across the region, authorities said.",
+]
+
+
+@pytest.mark.parametrize("text", LEDES)
+def test_news_ledes_pass_without_gazetteer(text):
+    assert prefilter_article(text).passed
+
+
+def test_http_error_is_blocked():
+    verdict = prefilter_article(LEDES[0], status_code=403)
+    assert not verdict.passed and verdict.blocked
+
+
+def test_short_fetched_block_page_is_blocked():
+    verdict = prefilter_article("Access denied. Please enable JavaScript and cookies to continue.", status_code=200)
+    assert not verdict.passed and verdict.blocked
+
+
+@pytest.mark.parametrize("text", [
+    "Hackers gained access to the city council's servers in Leeds; staff saw \"access denied\" on every login.",
+    "Ticket sales for the Lisbon concert stalled after fans were stuck on a captcha for hours on Friday.",
+    "Visitors to the Kenyan election commission's website in Nairobi got \"page not found\" errors all day.",
+])
+def test_pasted_text_quoting_block_phrases_is_kept(text):
+    verdict = prefilter_article(text)
+    assert verdict.passed and not verdict.blocked
+    assert prefilter_article(text, fetched=False).passed
+
+
+def test_empty_text_is_blocked():
+    assert prefilter_article("   ").blocked